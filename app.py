@@ -1,27 +1,54 @@
+import functools
+import hmac
 import os
-import traceback
+import secrets
+import uuid
+from datetime import date, datetime, time, timedelta
 
-from flask import Flask, render_template, request, redirect, url_for, flash
+import click
+from flask import (Blueprint, Flask, Response, abort, current_app, render_template, request, redirect,
+                   stream_with_context, url_for, flash, jsonify)
 from flask_bootstrap import Bootstrap
 from flask_wtf import FlaskForm
-from wtforms import IntegerField, StringField, SubmitField
-from wtforms.validators import DataRequired, Email
+from flask_wtf.csrf import generate_csrf
+from wtforms import DateTimeLocalField, HiddenField, IntegerField, StringField, SubmitField
+from wtforms.validators import DataRequired, Email, NumberRange
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import delete, distinct, func, insert, select
+from sqlalchemy.exc import IntegrityError
+from werkzeug.local import LocalProxy
+
+from assets import AssetManifest
+from availability import Slot, cells, find_slots
+from cart_store import init_cart_store
+from catalog_cache import CatalogCache
+from catalog_seed import load_practitioners, load_products, upsert_practitioners, upsert_products
+from customers import normalize_email, upsert_customer
+from db_profile import apply_pragmas, configure_engine
+from metrics import Instrumentation
+from page_cache import PageCache
+from sales import EXPORT_FORMATS, add_totals, sales_by_product
+from schema_upgrades import upgrade_schema
+from search_index import SearchIndex
 
 
-app = Flask(__name__)
-app.config['SECRET_KEY'] = '12345678987654321'
 basedir = os.path.abspath(os.path.dirname(__file__))
+# Treatments and practitioners loaded by `flask seed`
+PRODUCTS_FILE = os.path.join(basedir, 'data', 'products.json')
+PRACTITIONERS_FILE = os.path.join(basedir, 'data', 'practitioners.json')
 
-# Setting app configuration data
-app.config['SQLALCHEMY_DATABASE_URI'] =\
-    'sqlite:///' + os.path.join(basedir, 'ecommerce.db')
-app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-
-bootstrap = Bootstrap(app)
+# Extensions, bound to an application by create_app()
+bootstrap = Bootstrap()
+page_cache = PageCache()
+# Hashed static files and image variants from `flask build-assets`
+assets = AssetManifest()
 
 # Created an instance of the database and called it db
-db = SQLAlchemy(app)
+db = SQLAlchemy()
+instrumentation = Instrumentation()
+
+# The shop's pages and CLI commands; endpoints are 'shop.<view>'
+shop = Blueprint('shop', __name__, cli_group=None)
 
 
 # Database classes
@@ -45,18 +72,30 @@ class Product(db.Model):
     product_id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(100), nullable=False)
     price = db.Column(db.Float, nullable=False)
-    description1 = db.Column(db.String(1024))
-    description2 = db.Column(db.String(1024))
+    # Appointment length and who gives it; NULL for treatments that are not booked by time
+    duration_minutes = db.Column(db.Integer)
+    practitioner_role = db.Column(db.String(100))
+    # Long texts, only loaded when a single product is shown
+    description1 = db.deferred(db.Column(db.String(1024)))
+    description2 = db.deferred(db.Column(db.String(1024)))
 
     # represent a class's objects as a string
     def __repr__(self):
         return f'<Product {self.name}>'
 
-# Cart item table (id, quantity, product)
+
+# Products are read from memory; see catalog_cache.py
+catalog = CatalogCache()
+# Full-text index over the products; see search_index.py
+search_index = SearchIndex()
+
+# Cart item table (id, cart_key, quantity, product)
 class CartItem(db.Model):
     __tablename__ = 'cart_item'
 
     id = db.Column(db.Integer, primary_key=True)
+    # Random key kept in the visitor's session (cart_store.DatabaseCartStore)
+    cart_key = db.Column(db.String(32), nullable=False, index=True)
     product_id = db.Column(db.Integer, db.ForeignKey(
         'product.product_id'), nullable=False)
     quantity = db.Column(db.Integer, nullable=False)
@@ -66,7 +105,11 @@ class CartItem(db.Model):
 
     # represent a class's objects as a string
     def __repr__(self):
-        return f"CartItem(id={self.id}, product_id={self.product_id}, quantity={self.quantity})"
+        return f"CartItem(id={self.id}, cart_key={self.cart_key}, product_id={self.product_id}, quantity={self.quantity})"
+
+
+# The visitor's own cart, from the store picked by create_app(); see cart_store.py
+carts = LocalProxy(lambda: current_app.extensions['cart_store'])
 
 # Customer (id, first_name, last_name, cell_phone, email, orders)
 class Customer(db.Model):
@@ -74,30 +117,108 @@ class Customer(db.Model):
     first_name = db.Column(db.String(50), nullable=False)
     last_name = db.Column(db.String(50), nullable=False)
     cell_phone = db.Column(db.String(15), nullable=False)
-    email = db.Column(db.String(100), nullable=False)
+    # One row per address, stored normalized (customers.normalize_email)
+    email = db.Column(db.String(100), nullable=False, unique=True, index=True)
     orders = db.relationship('Order', backref='customer', lazy=True)
 
-# Order (id, customer_id)
+# Order (id, customer_id, idempotency_key, created_at)
 class Order(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     customer_id = db.Column(db.Integer, db.ForeignKey(
-        'customer.id'), nullable=False)
+        'customer.id'), nullable=False, index=True)
+    # Token from the checkout form; a resubmitted form finds the existing order
+    idempotency_key = db.Column(db.String(64), unique=True, index=True)
+    # Clinic local time; NULL for orders placed before it was recorded
+    created_at = db.Column(db.DateTime, default=datetime.now, index=True)
     items = db.relationship('OrderItem', backref='order', lazy=True)
 
-# orderItem (id, order_id, product_id, quantity)
+# orderItem (id, order_id, product_id, quantity, unit_price)
 class OrderItem(db.Model):
+    # Covers the order lines by order_id, so order_history() never reads the table
+    __table_args__ = (db.Index('ix_order_item_order_lines', 'order_id', 'product_id', 'quantity', 'unit_price'),)
+
     id = db.Column(db.Integer, primary_key=True)
     order_id = db.Column(db.Integer, db.ForeignKey('order.id'), nullable=False)
-    product_id = db.Column(db.Integer, nullable=False)
+    product_id = db.Column(db.Integer, nullable=False, index=True)
     quantity = db.Column(db.Integer, nullable=False)
+    # Price paid, copied from the product at checkout
+    unit_price = db.Column(db.Float)
+
+# Sales summaries, updated by every checkout (record_sales) and rebuilt
+# from the orders by `flask rebuild-sales`
+# productSales (product_id, orders, quantity, revenue): all-time totals per treatment
+class ProductSales(db.Model):
+    __tablename__ = 'product_sales'
+
+    product_id = db.Column(db.Integer, primary_key=True)
+    orders = db.Column(db.Integer, nullable=False, default=0)
+    quantity = db.Column(db.Integer, nullable=False, default=0)
+    revenue = db.Column(db.Float, nullable=False, default=0)
+
+# dailySales (day, product_id, orders, quantity, revenue): totals per treatment and day
+class DailySales(db.Model):
+    __tablename__ = 'daily_sales'
+
+    day = db.Column(db.Date, primary_key=True)
+    product_id = db.Column(db.Integer, primary_key=True)
+    orders = db.Column(db.Integer, nullable=False, default=0)
+    quantity = db.Column(db.Integer, nullable=False, default=0)
+    revenue = db.Column(db.Float, nullable=False, default=0)
+
+# Practitioner (id, name, role); role matches Product.practitioner_role
+class Practitioner(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(100), nullable=False)
+    role = db.Column(db.String(100), nullable=False, index=True)
+
+# workingHours (practitioner_id, weekday, start_minute, end_minute): the weekly calendar,
+# weekday 0 is Monday and the minutes count from midnight
+class WorkingHours(db.Model):
+    __tablename__ = 'working_hours'
+
+    id = db.Column(db.Integer, primary_key=True)
+    practitioner_id = db.Column(db.Integer, db.ForeignKey('practitioner.id'), nullable=False, index=True)
+    weekday = db.Column(db.Integer, nullable=False)
+    start_minute = db.Column(db.Integer, nullable=False)
+    end_minute = db.Column(db.Integer, nullable=False)
+
+# booking (id, practitioner_id, product_id, customer_id, starts_at, ends_at, created_at)
+# A booking without a product just blocks the time (leave, meetings)
+class Booking(db.Model):
+    # Bookings of a practitioner ending after a given time, without reading the table
+    __table_args__ = (db.Index('ix_booking_practitioner_time', 'practitioner_id', 'ends_at', 'starts_at'),)
+
+    id = db.Column(db.Integer, primary_key=True)
+    practitioner_id = db.Column(db.Integer, db.ForeignKey('practitioner.id'), nullable=False)
+    product_id = db.Column(db.Integer)
+    customer_id = db.Column(db.Integer, db.ForeignKey('customer.id'), index=True)
+    starts_at = db.Column(db.DateTime, nullable=False)
+    ends_at = db.Column(db.DateTime, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.now)
+
+# bookingCell (practitioner_id, starts_at, booking_id): one row per CELL_MINUTES of a
+# booking. The primary key makes a second booking of the same minutes fail.
+class BookingCell(db.Model):
+    __tablename__ = 'booking_cell'
+
+    practitioner_id = db.Column(db.Integer, primary_key=True)
+    starts_at = db.Column(db.DateTime, primary_key=True)
+    booking_id = db.Column(db.Integer, db.ForeignKey('booking.id'), nullable=False, index=True)
 
 # Forms Classes 
-# checkoutForm (first_name, last_name, cell_phone, email)
+# checkoutForm (first_name, last_name, cell_phone, email, checkout_token)
 class CheckoutForm(FlaskForm):
     first_name = StringField('First Name', validators=[DataRequired()])
     last_name = StringField('Last Name', validators=[DataRequired()])
     cell_phone = StringField('Cell Phone', validators=[DataRequired()])
     email = StringField('Email', validators=[DataRequired(), Email()])
+    checkout_token = HiddenField('Checkout Token')
+
+# bookingForm: the patient's details plus the chosen time
+class BookingForm(CheckoutForm):
+    product_id = IntegerField('Treatment', validators=[DataRequired()])
+    practitioner_id = IntegerField('Practitioner', validators=[DataRequired()])
+    starts_at = DateTimeLocalField('Start', validators=[DataRequired()])
 
 class SearchForm(FlaskForm):
     search = StringField('Search', validators=[DataRequired()])
@@ -105,116 +226,133 @@ class SearchForm(FlaskForm):
 
 
 class AddToCartForm(FlaskForm):
-    quantity = IntegerField('Quantity', validators=[DataRequired()])
+    quantity = IntegerField('Quantity', validators=[DataRequired(), NumberRange(min=1)])
     submit = SubmitField('Add to Cart')
 
 
 # Templates routes
-@app.route('/add_to_cart', methods=['POST'])
+@shop.route('/add_to_cart', methods=['POST'])
 def add_to_cart():
     product_id = request.form.get('product_id')
     quantity = request.form.get('quantity')
 
-    print('product_id: ', product_id, ' quantity: ', quantity)
-    product = db.session.query(Product).filter_by(product_id=1).first()
+    current_app.logger.debug('add_to_cart product_id=%s quantity=%s', product_id, quantity)
+    product = catalog.get(product_id)
     # Create the form instance with the request form data
     add_to_cart_form = AddToCartForm(request.form)
 
     if product and add_to_cart_form.validate_on_submit():
         quantity = add_to_cart_form.quantity.data
-        print('product_id: ', product_id, ' quantity: ', quantity)
-
-        # Add the product to the cart
-        cart_item = CartItem(product_id=product_id, quantity=quantity)
-        db.session.add(cart_item)
-        db.session.commit()
 
-        flash(f'{product.name} added to cart!', 'success')
+        # Add the product to the visitor's cart
+        if carts.add(product.product_id, quantity):
+            flash(f'{product.name} added to cart!', 'success')
+        else:
+            flash('Your cart is full!', 'danger')
     else:
         # Form validation failed
-        print("Form validation failed")
-        print("Form errors:", add_to_cart_form.errors)
+        current_app.logger.debug('add_to_cart form errors: %s', add_to_cart_form.errors)
 
         flash('Product not found or invalid quantity!', 'danger')
 
     return redirect('appointment.html')
 
 # Checkout route
-@app.route('/checkout', methods=['GET', 'POST'])
+@shop.route('/checkout', methods=['GET', 'POST'])
 def checkout():
     if request.method == 'POST':
         # Clear the cart after successful checkout
-        CartItem.query.delete()
-        db.session.commit()
+        carts.clear()
 
         flash('Checkout successful! Thank you for your purchase!', 'success')
-        return redirect(url_for('index'))
+        return redirect(url_for('.index'))
 
-    return render_template('checkout.html')
+    add_to_cart_form = AddToCartForm()
+
+    return render_template('checkout.html', add_to_cart_form=add_to_cart_form, cart=carts.view(),
+                           checkout_token=uuid.uuid4().hex)
 
 # index function route
-@app.route('/', methods=['GET', 'POST'])
+@shop.route('/', methods=['GET', 'POST'])
+@page_cache.cached
 def index():
-    form = SignupForm()
-    add_to_cart_form = AddToCartForm()
+    # Cached for everyone, so no CSRF token in the page; base.html fetches it
+    form = SignupForm(meta={'csrf': False})
+    add_to_cart_form = AddToCartForm(meta={'csrf': False})
 
     return render_template('landing.html', form=form, add_to_cart_form=add_to_cart_form)
 
 # musculoskeletal route
-@app.route('/musculokeletal.html')
+@shop.route('/musculokeletal.html')
+@page_cache.cached
 def musculokeletal():
     return render_template('musculokeletal.html')
 
 # neurotherpay route
-@app.route('/neurotherapy.html')
+@shop.route('/neurotherapy.html')
+@page_cache.cached
 def neurotherapy():
     return render_template('neurotherapy.html')
 
 # Contact route
-@app.route('/contact.html')
+@shop.route('/contact.html')
+@page_cache.cached
 def contact():
     return render_template('contact.html')
 
 # Appointment route
-@app.route('/appointment.html')
+@shop.route('/appointment.html')
+@page_cache.cached
 def appointment():
-    add_to_cart_form = AddToCartForm()
+    add_to_cart_form = AddToCartForm(meta={'csrf': False})
 
     return render_template('appointment.html', add_to_cart_form=add_to_cart_form)
 
+# CSRF token for the forms on cached pages
+@shop.route('/csrf_token')
+def csrf_token():
+    response = jsonify(csrf_token=generate_csrf())
+    response.cache_control.no_store = True
+    return response
+
 # Cart route
-@app.route('/cart.html', methods=['POST', 'GET'])
+@shop.route('/cart.html', methods=['POST', 'GET'])
 def cart():
-    cart_items = CartItem.query.all()
+    # Lines with names, prices and totals from a single query
+    cart = carts.view()
     add_to_cart_form = AddToCartForm()
-    if not cart_items:
+    if not cart.lines:
         flash('Your cart is empty.', 'info')
 
-        return redirect(url_for('appointment'))
+        return redirect(url_for('.appointment'))
 
-    return render_template('cart.html', cart_items=cart_items, add_to_cart_form=add_to_cart_form)
+    return render_template('cart.html', cart_items=cart.lines, cart_total=cart.total, add_to_cart_form=add_to_cart_form)
 
 # Delete treatment/product from cart
-@app.route('/remove_from_cart', methods=['POST'])
+@shop.route('/remove_from_cart', methods=['POST'])
 def remove_from_cart():
     cart_item_id = request.form.get('cart_item_id')
 
-    cart_item = CartItem.query.get(cart_item_id)
-    if cart_item:
-        db.session.delete(cart_item)
-        db.session.commit()
+    if carts.remove(cart_item_id):
         flash('Item removed from cart!', 'success')
     else:
         flash('Item not found in cart!', 'danger')
 
-    return redirect(url_for('cart'))
+    return redirect(url_for('.cart'))
+
+# Read ?after=<product_id>&limit= for the keyset-paginated listings
+def page_args():
+    after = request.values.get('after', 0, type=int)
+    limit = request.values.get('limit', current_app.config['PRODUCT_PAGE_SIZE'], type=int)
+    return max(after, 0), min(max(limit, 1), current_app.config['PRODUCT_PAGE_MAX'])
 
 # Product details route
-@app.route('/product_details', methods=['POST'])
+@shop.route('/product_details', methods=['GET', 'POST'])
 def product_details():
     add_to_cart_form = AddToCartForm()
 
-    products = Product.query.all()
+    after, limit = page_args()
+    products, next_after = catalog.page(after, limit)
 
     # Prepare the data to pass to the template
     cart_items = [
@@ -224,158 +362,524 @@ def product_details():
     ]
 
     # Render the cart template with the product data
-    return render_template('product_details.html', add_to_cart_form=add_to_cart_form, cart_items=cart_items)
+    return render_template('product_details.html', add_to_cart_form=add_to_cart_form, cart_items=cart_items,
+                           next_after=next_after, limit=limit)
+
+# Single treatment with its full descriptions
+@shop.route('/product_details/<int:product_id>')
+def product_detail(product_id):
+    add_to_cart_form = AddToCartForm()
+
+    product = db.session.execute(
+        select(Product.product_id, Product.name, Product.price, Product.description1)
+        .where(Product.product_id == product_id)).first()
+    if product is None:
+        flash('Product not found!', 'danger')
+        return redirect(url_for('.product_details'))
+
+    cart_items = [{'product_id': product.product_id, 'name': product.name, 'price': product.price,
+                   'desc1': product.description1}]
+    return render_template('product_details_qresult.html', add_to_cart_form=add_to_cart_form, cart_items=cart_items)
+
+# JSON product listing, keyset-paginated like the HTML one
+@shop.route('/api/products')
+def api_products():
+    after, limit = page_args()
+    products, next_after = catalog.page(after, limit)
+
+    return jsonify(products=[product._asdict() for product in products], next_after=next_after)
+
+@shop.route('/api/products/<int:product_id>')
+def api_product(product_id):
+    product = db.session.execute(
+        select(Product.product_id, Product.name, Product.price, Product.description1, Product.description2)
+        .where(Product.product_id == product_id)).first()
+    if product is None:
+        return jsonify(error='Product not found'), 404
+
+    return jsonify(product._asdict())
 
 # Search for product on landing page
-@app.route('/product_search', methods=['GET', 'POST'])
+@shop.route('/product_search', methods=['GET', 'POST'])
 def product_search():
     add_to_cart_form = AddToCartForm()
 
     if request.method == 'POST':
         search_query = request.form.get('search_query')
-        products = Product.query.filter(
-            Product.name.ilike(f"%{search_query}%")).all()
-
-        # Prepare the data to pass to the template
-        cart_items = [
-            {'product_id': product.product_id, 'name': product.name, 'price': product.price,
-             'desc1': product.description1, 'desc2': product.description2}
-            for product in products
-        ]
-        for product in products:
-            print(product.name, product.description1, product.description2)
+        if search_index.available:
+            # Ranked full-text match over name and descriptions
+            cart_items = search_index.search(search_query)
+        else:
+            # No FTS5 in this SQLite build: substring match on the name
+            products = catalog.search(search_query)[:search_index.limit]
+
+            # Only the start of each description, the full text is on the detail page
+            excerpts = dict(db.session.execute(
+                select(Product.product_id, func.substr(Product.description1, 1, 300))
+                .where(Product.product_id.in_([product.product_id for product in products]))).all())
+
+            # Prepare the data to pass to the template
+            cart_items = [
+                {'product_id': product.product_id, 'name': product.name, 'price': product.price,
+                 'desc1': excerpts.get(product.product_id)}
+                for product in products
+            ]
+        current_app.logger.debug('product_search query=%r results=%d', search_query, len(cart_items))
 
         if len(cart_items):
             return render_template('product_details_qresult.html', add_to_cart_form=add_to_cart_form, cart_items=cart_items)
         else:
             flash('Empty result for your search!', 'message')
-            return redirect(url_for('index'))
+            return redirect(url_for('.index'))
 
-    return redirect(url_for('index'))
+    return redirect(url_for('.index'))
 
 
-@app.route('/do_checkout', methods=['POST'])
+@shop.route('/do_checkout', methods=['POST'])
 def do_checkout():
     add_to_cart_form = AddToCartForm()
 
-    return render_template('checkout.html', add_to_cart_form=add_to_cart_form)
+    # One token per rendered form, so a double-submit places a single order
+    return render_template('checkout.html', add_to_cart_form=add_to_cart_form, cart=carts.view(),
+                           checkout_token=uuid.uuid4().hex)
+
+# Add the customer, order and order items to the session without committing,
+# so the caller commits the whole order in one transaction
+def place_order(form, cart_lines, idempotency_key=None):
+    # Returning patients are matched on their email and get their latest details
+    customer_id = upsert_customer(
+        db.session, Customer, form.email.data,
+        first_name=form.first_name.data,
+        last_name=form.last_name.data,
+        cell_phone=form.cell_phone.data)
+    order = Order(customer_id=customer_id, idempotency_key=idempotency_key)
+    db.session.add(order)
+    db.session.flush()
+
+    # Single executemany for all lines, with the price snapshotted from the cart
+    db.session.execute(insert(OrderItem), [
+        {'order_id': order.id, 'product_id': line.product_id,
+         'quantity': line.quantity, 'unit_price': line.unit_price}
+        for line in cart_lines
+    ])
+    record_sales(order, cart_lines)
+    return order
+
+# Add an order's lines to the sales summaries, in the order's transaction
+def record_sales(order, lines):
+    rows = sales_by_product(lines)
+    add_totals(db.session, ProductSales.__table__, rows)
+    add_totals(db.session, DailySales.__table__,
+               [dict(row, day=order.created_at.date()) for row in rows])
+
+# Recompute the sales summaries from all orders in one transaction.
+# Lines from before price snapshots are valued at the current price.
+def rebuild_sales():
+    price = func.coalesce(OrderItem.unit_price, Product.price)
+    totals = [func.count(distinct(OrderItem.order_id)), func.sum(OrderItem.quantity),
+              func.sum(OrderItem.quantity * price)]
+    lines = (select(OrderItem.product_id, *totals)
+             .outerjoin(Product, Product.product_id == OrderItem.product_id))
+    day = func.date(Order.created_at)
+
+    db.session.execute(delete(ProductSales))
+    db.session.execute(delete(DailySales))
+    db.session.execute(insert(ProductSales).from_select(
+        ['product_id', 'orders', 'quantity', 'revenue'],
+        lines.group_by(OrderItem.product_id)))
+    db.session.execute(insert(DailySales).from_select(
+        ['product_id', 'orders', 'quantity', 'revenue', 'day'],
+        lines.add_columns(day).join(Order, Order.id == OrderItem.order_id)
+        .where(Order.created_at.is_not(None)).group_by(day, OrderItem.product_id)))
+    db.session.commit()
+
+# Past orders for an email, newest first. Every step is an index lookup:
+# ix_customer_email, ix_order_customer_id, then ix_order_item_order_lines.
+def order_history(email, limit=20):
+    customer_id = db.session.execute(
+        select(Customer.id).where(Customer.email == normalize_email(email))).scalar()
+    if customer_id is None:
+        return []
+
+    recent = (select(Order.id).where(Order.customer_id == customer_id)
+              .order_by(Order.id.desc()).limit(limit))
+    rows = db.session.execute(
+        select(OrderItem.order_id, OrderItem.product_id, OrderItem.quantity, OrderItem.unit_price)
+        .where(OrderItem.order_id.in_(recent.scalar_subquery()))
+        .order_by(OrderItem.order_id.desc()))
+
+    orders = {}
+    for row in rows:
+        order = orders.setdefault(row.order_id, {'order_id': row.order_id, 'lines': [], 'total': 0.0})
+        # Names from the in-memory catalog rather than the product table
+        product = catalog.get(row.product_id)
+        order['lines'].append({'product_id': row.product_id,
+                               'name': product.name if product else f'Treatment #{row.product_id}',
+                               'quantity': row.quantity, 'unit_price': row.unit_price})
+        order['total'] += (row.unit_price or 0) * row.quantity
+    return list(orders.values())
+
+# Treatments booked by time: they have a length and a practitioner role
+def bookable_product(product_id):
+    product = catalog.get(product_id)
+    if product is None or not product.duration_minutes or not product.practitioner_role:
+        return None
+    return product
+
+# Free times for a treatment between two datetimes, over every practitioner
+# with its role (or just `practitioner_id`). Three queries however long the
+# range: practitioners, their weekly hours, and the bookings in the range,
+# which availability.find_slots turns into one interval index each.
+def find_availability(product, start, end, practitioner_id=None):
+    start = max(start, datetime.now())
+    practitioners = select(Practitioner.id).where(Practitioner.role == product.practitioner_role)
+    if practitioner_id is not None:
+        practitioners = practitioners.where(Practitioner.id == practitioner_id)
+    ids = db.session.execute(practitioners).scalars().all()
+    if not ids:
+        return []
+
+    hours = {}
+    for row in db.session.execute(select(WorkingHours).where(WorkingHours.practitioner_id.in_(ids))).scalars():
+        hours.setdefault(row.practitioner_id, {}).setdefault(row.weekday, []).append(
+            (row.start_minute, row.end_minute))
+    busy = db.session.execute(
+        select(Booking.practitioner_id, Booking.starts_at, Booking.ends_at)
+        .where(Booking.practitioner_id.in_(ids), Booking.ends_at > start, Booking.starts_at < end))
+
+    return find_slots(ids, hours, busy, start, end, timedelta(minutes=product.duration_minutes),
+                      current_app.config['APPOINTMENT_SLOT_STEP'])
+
+# Add a booking and the cells it covers to the session without committing.
+# Raises IntegrityError when another booking already holds any of the cells.
+def book_appointment(practitioner_id, product, starts_at, customer_id=None):
+    ends_at = starts_at + timedelta(minutes=product.duration_minutes)
+    booking = Booking(practitioner_id=practitioner_id, product_id=product.product_id,
+                      customer_id=customer_id, starts_at=starts_at, ends_at=ends_at)
+    db.session.add(booking)
+    db.session.flush()
+
+    db.session.execute(insert(BookingCell), [
+        {'practitioner_id': practitioner_id, 'starts_at': cell, 'booking_id': booking.id}
+        for cell in cells(starts_at, ends_at)
+    ])
+    return booking
+
+def cancel_booking(booking_id):
+    db.session.execute(delete(BookingCell).where(BookingCell.booking_id == booking_id))
+    return db.session.execute(delete(Booking).where(Booking.id == booking_id)).rowcount
+
+# Free appointment times: ?product_id=&since=YYYY-MM-DD&until=YYYY-MM-DD
+# (a week from today by default, at most APPOINTMENT_MAX_DAYS)
+@shop.route('/api/availability')
+def api_availability():
+    product = bookable_product(request.args.get('product_id'))
+    if product is None:
+        return jsonify(error='Not a bookable treatment'), 404
+
+    since, until = date_args()
+    since = since or date.today()
+    until = min(until or since + timedelta(days=6),
+                since + timedelta(days=current_app.config['APPOINTMENT_MAX_DAYS'] - 1))
+    slots = find_availability(product, datetime.combine(since, time()),
+                              datetime.combine(until + timedelta(days=1), time()))
+
+    names = dict(db.session.execute(select(Practitioner.id, Practitioner.name)
+                                    .where(Practitioner.id.in_({slot.practitioner_id for slot in slots}))).all())
+    return jsonify(product_id=product.product_id, duration_minutes=product.duration_minutes, slots=[
+        {'practitioner_id': slot.practitioner_id, 'practitioner': names[slot.practitioner_id],
+         'starts_at': slot.starts_at.isoformat(timespec='minutes')}
+        for slot in slots
+    ])
+
+# Book a time offered by /api/availability. Takes the BookingForm fields and
+# a csrf_token (see /csrf_token); answers 201, or 409 when the time is gone.
+@shop.route('/api/bookings', methods=['POST'])
+def api_book():
+    form = BookingForm(request.form)
+    if not form.validate():
+        return jsonify(errors=form.errors), 400
+    product = bookable_product(form.product_id.data)
+    if product is None:
+        return jsonify(error='Not a bookable treatment'), 404
+
+    # Only times the engine offers: working hours, on the slot grid, not in the past
+    practitioner_id, starts_at = form.practitioner_id.data, form.starts_at.data
+    day = datetime.combine(starts_at.date(), time())
+    if Slot(practitioner_id, starts_at) not in find_availability(product, day, day + timedelta(days=1), practitioner_id):
+        return jsonify(error='This time is not available'), 409
+
+    try:
+        customer_id = upsert_customer(
+            db.session, Customer, form.email.data,
+            first_name=form.first_name.data,
+            last_name=form.last_name.data,
+            cell_phone=form.cell_phone.data)
+        booking = book_appointment(practitioner_id, product, starts_at, customer_id)
+        db.session.commit()
+    except IntegrityError:
+        # A concurrent request booked overlapping time after the check above
+        db.session.rollback()
+        return jsonify(error='This time is not available'), 409
+
+    return jsonify(booking_id=booking.id, practitioner_id=practitioner_id,
+                   starts_at=booking.starts_at.isoformat(timespec='minutes'),
+                   ends_at=booking.ends_at.isoformat(timespec='minutes')), 201
+
+# Staff views need "Authorization: Bearer <STAFF_TOKEN>"; without a token
+# configured they do not exist
+def staff_only(view):
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        token = current_app.config['STAFF_TOKEN']
+        if not token:
+            abort(404)
+        # Compare bytes: compare_digest() rejects str with non-ASCII characters.
+        # WSGI headers are latin-1 decoded, which gives back the bytes as sent
+        sent = request.headers.get('Authorization', '').encode('latin-1', 'replace')
+        if not hmac.compare_digest(sent, f'Bearer {token}'.encode('utf-8')):
+            abort(401)
+        return view(*args, **kwargs)
+    return wrapper
+
+# Read ?since=YYYY-MM-DD&until=YYYY-MM-DD (both inclusive)
+def date_args():
+    try:
+        return [date.fromisoformat(request.args[name]) if request.args.get(name) else None
+                for name in ('since', 'until')]
+    except ValueError:
+        abort(400)
+
+# Revenue and volume per treatment, and per treatment and day, for the dashboard
+@shop.route('/staff/sales')
+@staff_only
+def staff_sales():
+    since, until = date_args()
+    products = db.session.execute(select(ProductSales).order_by(ProductSales.revenue.desc())).scalars()
+
+    days = select(DailySales).order_by(DailySales.day, DailySales.product_id)
+    if since:
+        days = days.where(DailySales.day >= since)
+    if until:
+        days = days.where(DailySales.day <= until)
+
+    def summary(row, **extra):
+        product = catalog.get(row.product_id)
+        return dict(extra, product_id=row.product_id, name=product.name if product else None,
+                    orders=row.orders, quantity=row.quantity, revenue=round(row.revenue, 2))
+
+    return jsonify(products=[summary(row) for row in products],
+                   days=[summary(row, day=row.day.isoformat()) for row in db.session.execute(days).scalars()])
+
+# Order lines as CSV or NDJSON, streamed in batches of EXPORT_BATCH_SIZE rows
+@shop.route('/staff/orders.<fmt>')
+@staff_only
+def staff_order_export(fmt):
+    if fmt not in EXPORT_FORMATS:
+        abort(404)
+    mimetype, chunks = EXPORT_FORMATS[fmt]
+    since, until = date_args()
+    batch_size = current_app.config['EXPORT_BATCH_SIZE']
+
+    query = (select(Order.id, Order.created_at, Order.customer_id, OrderItem.product_id,
+                    OrderItem.quantity, OrderItem.unit_price)
+             .join(OrderItem, OrderItem.order_id == Order.id)
+             .order_by(Order.id))
+    if since:
+        query = query.where(Order.created_at >= datetime.combine(since, datetime.min.time()))
+    if until:
+        query = query.where(Order.created_at < datetime.combine(until + timedelta(days=1), datetime.min.time()))
+
+    columns = ['order_id', 'created_at', 'customer_id', 'product_id', 'product_name', 'quantity', 'unit_price']
+
+    def rows():
+        # yield_per fetches batch_size rows at a time instead of the whole result
+        for row in db.session.execute(query.execution_options(yield_per=batch_size)):
+            product = catalog.get(row.product_id)
+            yield (row.id, row.created_at, row.customer_id, row.product_id,
+                   product.name if product else None, row.quantity, row.unit_price)
+
+    response = Response(stream_with_context(chunks(columns, rows(), batch_size)), mimetype=mimetype)
+    response.headers['Content-Disposition'] = f'attachment; filename=orders.{fmt}'
+    return response
 
 # Checkout form
-@app.route('/proc_checkout', methods=['POST'])
+@shop.route('/proc_checkout', methods=['POST'])
 def proc_checkout():
     form = CheckoutForm(request.form)
 
     if form.validate():
-        first_name = form.first_name.data
-        last_name = form.last_name.data
-        cell_phone = form.cell_phone.data
-        email = form.email.data
-
-        # Save customer to the database
-        customer = Customer(
-            first_name=first_name,
-            last_name=last_name,
-            cell_phone=cell_phone,
-            email=email)
-        db.session.add(customer)
-        db.session.commit()
-
-        # Save cart items to the order
-        cart_items = CartItem.query.all()
-        order = Order(customer_id=customer.id)
-
-        for cart_item in cart_items:
-            order_item = OrderItem(
-                order=order,
-                product_id=cart_item.product_id,
-                quantity=cart_item.quantity)
-            db.session.add(order_item)
-
-        db.session.commit()
-
-        # Empty the cart
-        CartItem.query.delete()
-        db.session.commit()
+        checkout_token = form.checkout_token.data or None
+
+        if checkout_token and Order.query.filter_by(idempotency_key=checkout_token).first():
+            # The same form was submitted again; the order already exists
+            carts.clear()
+            flash('Checkout successful!', 'success')
+            return redirect(url_for('.appointment'))
+
+        cart = carts.view()
+        if not cart.lines:
+            flash('Your cart is empty.', 'info')
+            return redirect(url_for('.appointment'))
+
+        try:
+            place_order(form, cart.lines, checkout_token)
+            # Empty the cart in the same transaction as the order
+            carts.clear(commit=False)
+            db.session.commit()
+        except IntegrityError:
+            # A concurrent submit of the same form won the race
+            db.session.rollback()
+            if not checkout_token:
+                raise
+            carts.clear()
 
         flash('Checkout successful!', 'success')
-        return redirect(url_for('appointment'))
+        return redirect(url_for('.appointment'))
     else:
         flash('Invalid form data. Please check your input.', 'error')
-        return redirect(url_for('cart'))
-
-
-# To maintain track of the application-level data during a request
+        return redirect(url_for('.cart'))
+
+
+def init_db():
+    """Create missing tables and bring existing ones up to date."""
+    db.create_all()
+    upgrade_schema(db.engine)
+    # Build the full-text index here, not on the first search
+    search_index.install()
+    # Sales summaries added to a database that already has orders
+    if db.session.query(ProductSales.product_id).first() is None and db.session.query(OrderItem.id).first():
+        rebuild_sales()
+
+def load_catalog(path=PRODUCTS_FILE):
+    """Insert or update the treatments in `path` in one transaction."""
+    inserted, updated = upsert_products(db.session, Product, load_products(path))
+    db.session.commit()
+    # Bulk statements skip the ORM events the catalog cache listens to
+    catalog.invalidate()
+    return inserted, updated
+
+def load_calendar(path=PRACTITIONERS_FILE):
+    """Insert or update the practitioners and their weekly hours in one transaction."""
+    inserted, updated = upsert_practitioners(db.session, Practitioner, WorkingHours, *load_practitioners(path))
+    db.session.commit()
+    return inserted, updated
+
+@shop.cli.command('init-db')
+def init_db_command():
+    """Create or upgrade the database tables."""
+    init_db()
+
+@shop.cli.command('seed')
+@click.option('--file', 'path', default=PRODUCTS_FILE, show_default=True,
+              type=click.Path(exists=True, dir_okay=False), help='JSON list of treatments')
+@click.option('--practitioners', 'practitioners_path', default=PRACTITIONERS_FILE, show_default=True,
+              type=click.Path(exists=True, dir_okay=False), help='JSON list of practitioners and their hours')
+def seed_command(path, practitioners_path):
+    """Load the treatments and practitioners from data files; safe to run again."""
+    init_db()
+    try:
+        inserted, updated = load_catalog(path)
+        click.echo(f'{inserted} treatments added, {updated} updated from {path}')
+        inserted, updated = load_calendar(practitioners_path)
+        click.echo(f'{inserted} practitioners added, {updated} updated from {practitioners_path}')
+    except ValueError as e:
+        raise click.ClickException(str(e))
+
+@shop.cli.command('cancel-booking')
+@click.argument('booking_id', type=int)
+def cancel_booking_command(booking_id):
+    """Cancel a booking and free its time."""
+    if not cancel_booking(booking_id):
+        raise click.ClickException(f'No booking {booking_id}')
+    db.session.commit()
+    click.echo(f'Booking {booking_id} cancelled')
+
+
+@shop.cli.command('order-history')
+@click.argument('email')
+@click.option('--limit', default=20, show_default=True, help='most recent orders to show')
+def order_history_command(email, limit):
+    """Show the past orders of the patient with this email."""
+    orders = order_history(email, limit)
+    if not orders:
+        click.echo(f'No orders for {normalize_email(email)}')
+    for order in orders:
+        click.echo(f'Order {order["order_id"]}: ${order["total"]:.2f}')
+        for line in order['lines']:
+            click.echo(f'  {line["quantity"]} x {line["name"]} @ ${line["unit_price"] or 0:.2f}')
+
+
+@shop.cli.command('rebuild-sales')
+def rebuild_sales_command():
+    """Recompute the sales summaries from all orders."""
+    rebuild_sales()
+    click.echo(f'{ProductSales.query.count()} treatments, {DailySales.query.count()} treatment-days')
+
+
+# Application factory, used by wsgi.py, `flask --app app` and the benchmarks
+def create_app(config=None):
+    app = Flask(__name__)
+    # Signs the session cookie (carts, flashes, CSRF). wsgi.py refuses to start
+    # without it; elsewhere a random key lasts until the process exits
+    app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY') or secrets.token_hex(32)
+
+    # Setting app configuration data
+    app.config['SQLALCHEMY_DATABASE_URI'] = os.environ.get(
+        'DATABASE_URL', 'sqlite:///' + os.path.join(basedir, 'ecommerce.db'))
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    # Seconds before a worker reloads the product catalog written by another worker
+    app.config['CATALOG_CACHE_TTL'] = int(os.environ.get('CATALOG_CACHE_TTL', 60))
+    # Maximum number of treatments returned by the search box
+    app.config['SEARCH_RESULT_LIMIT'] = 50
+    # Treatments per page in the product listing and /api/products (?after=<id>&limit=)
+    app.config['PRODUCT_PAGE_SIZE'] = 20
+    app.config['PRODUCT_PAGE_MAX'] = 100
+    # Where carts live: 'cookie' (signed session cookie) or 'db' (cart_item rows per session)
+    app.config['CART_BACKEND'] = os.environ.get('CART_BACKEND', 'cookie')
+    # SQLite engine profile: 'production' (WAL, busy timeout, pooled) or 'default'
+    app.config['DB_PROFILE'] = os.environ.get('DB_PROFILE', 'production')
+    # Cache of the rendered informational pages (see page_cache.py)
+    app.config['PAGE_CACHE_ENABLED'] = os.environ.get('PAGE_CACHE_ENABLED', '1') == '1'
+    app.config['PAGE_CACHE_DIR'] = os.environ.get('PAGE_CACHE_DIR')
+    # Request timing, SQL counts, Server-Timing header and /metrics (see metrics.py)
+    app.config['METRICS_ENABLED'] = os.environ.get('METRICS_ENABLED', '1') == '1'
+    app.config['SLOW_REQUEST_MS'] = int(os.environ.get('SLOW_REQUEST_MS', 500))
+    # Bearer token for the /staff/ views (sales summaries, order export); unset disables them
+    app.config['STAFF_TOKEN'] = os.environ.get('STAFF_TOKEN')
+    app.config['EXPORT_BATCH_SIZE'] = 1000
+    # Appointment start times are offered every APPOINTMENT_SLOT_STEP minutes (a multiple of 5)
+    app.config['APPOINTMENT_SLOT_STEP'] = 10
+    app.config['APPOINTMENT_MAX_DAYS'] = 31
+    # Overrides from the caller, e.g. tests or benchmarks
+    app.config.update(config or {})
+    sqlite_pragmas = configure_engine(app)
+
+    bootstrap.init_app(app)
+    page_cache.init_app(app)
+    assets.init_app(app)
+
+    db.init_app(app)
+    with app.app_context():
+        apply_pragmas(db.engine, sqlite_pragmas)
+    instrumentation.init_app(app, db)
+
+    catalog.init_app(app, db, Product)
+    search_index.init_app(app, db)
+    init_cart_store(app, db, CartItem, Product)
+
+    app.register_blueprint(shop)
+    return app
+
+
+# Development server; production runs wsgi.py
 if __name__ == '__main__':
-    with app.app_context() as ctxt:
-        db.create_all()
-
-        product_count = Product.query.count()
-
-        if product_count == 0:
-            try:
-                new_product = Product(product_id=1,
-                                      name="Principal Physiotherapist Initial Consultation (40mins)",
-                                      price=130,
-                                      description1='The "Principal Physiotherapist Initial Consultation (40mins)" is a comprehensive and focused session designed to provide individuals with a thorough assessment and expert guidance on their specific physical concerns. As the principal physiotherapist, this professional is highly experienced, knowledgeable, and skilled in diagnosing and treating a wide range of musculoskeletal conditions.\n The initial consultation typically lasts for approximately 40 minutes, ensuring there is sufficient time to address the individual`s concerns, perform a detailed assessment, and develop an appropriate treatment plan. The session usually takes place in a comfortable and private setting, such as a physiotherapy clinic or healthcare facility.\n During the consultation, the principal physiotherapist will begin by engaging in a conversation with the individual to gather more information about their symptoms, medical history, and any specific activities or movements that may exacerbate or alleviate their condition. This discussion helps the physiotherapist gain a comprehensive understanding of the individual\'s condition and its impact on their daily life.\n Afterward, the principal physiotherapist will perform a thorough physical examination, which may involve assessing joint mobility, muscle strength, posture, balance, and flexibility. They may also employ specialized tests and measures to further evaluate the individual\'s condition, such as range of motion assessments, palpation of affected areas, or specific functional tests.\n Based on the information gathered from the discussion and physical examination, the principal physiotherapist will then provide a detailed explanation of the diagnosis, outlining the underlying causes of the individual`s symptoms. They will discuss the treatment options available and develop a personalized treatment plan tailored to the individual`s needs, goals, and lifestyle.\n',
-                                      description2="D2"
-                                      )
-                db.session.add(new_product)
-                db.session.commit()
-
-                new_product = Product(product_id=2,
-                                      name="Principal Physiotherapist Subsequent Consultation (30mins)",
-                                      price=110,
-                                      description1="The \"Principal Physiotherapist Subsequent Consultation (30mins)\" is a follow-up session that builds on the initial consultation, focusing on monitoring progress, adjusting treatment plans as needed, and providing ongoing support.\nThe subsequent consultation, lasting approximately 30 minutes, allows the principal physiotherapist to assess the individual's response to treatment and make necessary modifications. It takes place in a similar setting as the initial consultation, such as a physiotherapy clinic.\nDuring the subsequent consultation, the principal physiotherapist engages in a conversation with the individual to gather feedback on progress since the last session. They inquire about changes in symptoms, functional abilities, or challenges faced. This discussion helps the physiotherapist evaluate the effectiveness of the initial intervention.\nFollowing the discussion, the principal physiotherapist performs a focused assessment to evaluate the current condition. This involves reassessing range of motion, muscle strength, functional movements, or specific tests relevant to the case. The physiotherapist compares findings to the initial consultation to track progress accurately.\nBased on the assessment and feedback, the principal physiotherapist adjusts the treatment plan. This may involve modifying exercise intensity or frequency, introducing new techniques or modalities, or additional interventions. The physiotherapist explains the rationale behind these adjustments and their contribution to overall recovery.\nDuring the subsequent consultation, the individual can discuss concerns, ask questions, and seek clarification regarding their condition or treatment plan. The principal physiotherapist provides ongoing education, advice, and self-management strategies to empower the individual in managing symptoms and preventing injuries.\nThe subsequent consultation offers continuous support, encouragement, and motivation. The physiotherapist monitors progress, sets goals, and collaborates with the individual for optimal outcomes.\nBy the end of the subsequent consultation, the individual understands their progress, modifications to the treatment plan, and next steps in their rehabilitation. They may receive recommendations for further sessions or referrals to other healthcare professionals if needed.",
-                                      description2="D2"
-                                      )
-                db.session.add(new_product)
-                db.session.commit()
-
-                new_product = Product(product_id=3,
-                                      name="Practice Physiotherapist Initial Consultation (40mins)",
-                                      price=125,
-                                      description1="The \"Practice Physiotherapist Initial Consultation (40mins)\" is a thorough 40-minute session for individuals seeking expert assessment and guidance for their physical concerns. The physiotherapist will review medical history, conduct a detailed assessment, and develop a personalized treatment plan.",
-                                      description2="D2"
-                                      )
-                db.session.add(new_product)
-                db.session.commit()
-
-                new_product = Product(product_id=4,
-                                      name="Practice Physiotherapist Subsequent Consultation (30mins)",
-                                      price=105,
-                                      description1="The \"Practice Physiotherapist Subsequent Consultation (30mins)\" is a shorter follow-up session designed to track the individual's progress and make necessary adjustments to their treatment plan. During this 30-minute consultation, the physiotherapist will assess how the individual has responded to the initial treatment and gather feedback on any changes in symptoms or functional abilities.\nBased on the assessment and feedback, the physiotherapist will modify the treatment plan as needed to ensure continued progress. They may introduce new exercises or techniques, adjust the intensity or frequency of existing interventions, or provide additional recommendations to address any specific concerns or challenges.\nThe subsequent consultation is an opportunity for the individual to discuss any questions, concerns, or difficulties they may have encountered during their rehabilitation journey. The physiotherapist will provide ongoing education, advice, and support to empower the individual in managing their condition and achieving their goals.\nOverall, the \"Practice Physiotherapist Subsequent Consultation (30mins)\" serves as a valuable check-in session to ensure that the treatment plan remains aligned with the individual's progress and evolving needs, ultimately helping them achieve optimal outcomes and improved physical well-being.",
-                                      description2="D2"
-                                      )
-                db.session.add(new_product)
-                db.session.commit()
-
-                new_product = Product(product_id=5,
-                                      name="20 Classes of Group Physiotherapy",
-                                      price=350,
-                                      description1="The \"20 Classes of Group Physiotherapy\" program offers a series of 20 group sessions aimed at improving participants' physical well-being and addressing specific therapeutic needs. Each class provides an opportunity for individuals to engage in guided exercises and therapeutic activities in a supportive group setting.\nDuring these group physiotherapy sessions, a qualified physiotherapist will lead the participants through a variety of exercises and movements tailored to address their specific conditions or goals. The physiotherapist will provide instructions, demonstrations, and guidance to ensure proper technique and safety throughout the class.\nThe exercises and activities conducted during the group sessions may include stretching, strengthening exercises, balance and coordination drills, cardiovascular conditioning, and functional movements. The physiotherapist will design the program in a progressive manner, gradually increasing the intensity and complexity of the exercises as participants build strength, endurance, and mobility.",
-                                      description2="D2"
-                                      )
-                db.session.add(new_product)
-                db.session.commit()
-
-                new_product = Product(product_id=6,
-                                      name="32 Classes of Group Physiotherapy",
-                                      price=550,
-                                      description1="The \"32 Classes of Group Physiotherapy\" program offers a series of 20 group sessions aimed at improving participants' physical well-being and addressing specific therapeutic needs. Each class provides an opportunity for individuals to engage in guided exercises and therapeutic activities in a supportive group setting.\nDuring these group physiotherapy sessions, a qualified physiotherapist will lead the participants through a variety of exercises and movements tailored to address their specific conditions or goals. The physiotherapist will provide instructions, demonstrations, and guidance to ensure proper technique and safety throughout the class.\nThe exercises and activities conducted during the group sessions may include stretching, strengthening exercises, balance and coordination drills, cardiovascular conditioning, and functional movements. The physiotherapist will design the program in a progressive manner, gradually increasing the intensity and complexity of the exercises as participants build strength, endurance, and mobility.",
-                                      description2="D2"
-                                      )
-                db.session.add(new_product)
-                db.session.commit()
-
-                new_product = Product(product_id=7,
-                                      name="58 Classes of Group Physiotherapy",
-                                      price=990,
-                                      description1="The \"58 Classes of Group Physiotherapy\" program offers a series of 20 group sessions aimed at improving participants' physical well-being and addressing specific therapeutic needs. Each class provides an opportunity for individuals to engage in guided exercises and therapeutic activities in a supportive group setting.\nDuring these group physiotherapy sessions, a qualified physiotherapist will lead the participants through a variety of exercises and movements tailored to address their specific conditions or goals. The physiotherapist will provide instructions, demonstrations, and guidance to ensure proper technique and safety throughout the class.\nThe exercises and activities conducted during the group sessions may include stretching, strengthening exercises, balance and coordination drills, cardiovascular conditioning, and functional movements. The physiotherapist will design the program in a progressive manner, gradually increasing the intensity and complexity of the exercises as participants build strength, endurance, and mobility.",
-                                      description2="D2"
-                                      )
-                db.session.add(new_product)
-                db.session.commit()
-
-            except Exception as e:
-                traceback.print_exc()
+    app = create_app()
+    with app.app_context():
+        init_db()
+        # First run on an empty database: load the treatments
+        if db.session.query(Product.product_id).first() is None:
+            load_catalog()
+        if db.session.query(Practitioner.id).first() is None:
+            load_calendar()
     app.run(debug=True)
@@ -0,0 +1,184 @@
+import hashlib
+import json
+import os
+import re
+
+from collections import namedtuple
+
+import click
+from flask import current_app, request, url_for
+from markupsafe import Markup, escape
+
+
+# Widths (px) of the responsive image variants; an image is never upscaled,
+# its own width is always the largest variant
+VARIANT_WIDTHS = (100, 320, 640, 1024, 1600)
+IMAGE_FORMATS = {
+    'webp': {'quality': 80, 'method': 6},
+    'avif': {'quality': 55},
+}
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.webp')
+ONE_YEAR = 365 * 24 * 3600
+
+# The loaded manifest.json and a hash of its bytes (None without a build);
+# page_cache.py keys pages on the digest since they embed the hashed URLs
+Manifest = namedtuple('Manifest', ['entries', 'digest'])
+
+
+def content_hash(data):
+    return hashlib.sha256(data).hexdigest()[:10]
+
+
+def hashed_name(path, data, suffix=None):
+    """'images/running stairs.jpeg' -> 'images/running-stairs.<hash>.jpeg'"""
+    folder, name = os.path.split(path)
+    stem, ext = os.path.splitext(name)
+    stem = re.sub(r'\s+', '-', stem)
+    if suffix:
+        stem = f'{stem}-{suffix}'
+    return os.path.join(folder, f'{stem}.{content_hash(data)}{ext}').replace(os.sep, '/')
+
+
+def write_file(root, path, data):
+    target = os.path.join(root, path)
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    with open(target, 'wb') as f:
+        f.write(data)
+
+
+def build_image(source_path, relative, build_dir, formats):
+    from io import BytesIO
+
+    from PIL import Image, ImageOps
+
+    with open(source_path, 'rb') as f:
+        original = f.read()
+    src = hashed_name(relative, original)
+    write_file(build_dir, src, original)
+
+    image = ImageOps.exif_transpose(Image.open(BytesIO(original)))
+    if image.mode not in ('RGB', 'RGBA'):
+        image = image.convert('RGB')
+    widths = [width for width in VARIANT_WIDTHS if width < image.width] + [image.width]
+
+    entry = {'src': 'build/' + src, 'width': image.width, 'height': image.height, 'variants': {}}
+    for fmt in formats:
+        variants = []
+        for width in widths:
+            height = round(image.height * width / image.width)
+            resized = image if width == image.width else image.resize((width, height), Image.LANCZOS)
+            buffer = BytesIO()
+            resized.save(buffer, fmt.upper(), **IMAGE_FORMATS[fmt])
+            data = buffer.getvalue()
+            name = hashed_name(os.path.splitext(relative)[0] + '.' + fmt, data, suffix=f'{width}w')
+            write_file(build_dir, name, data)
+            variants.append([width, 'build/' + name])
+        entry['variants'][fmt] = variants
+    return entry
+
+
+def build_assets(static_folder, formats=('webp', 'avif'), echo=print):
+    """Write hashed copies and image variants to static/build plus manifest.json.
+
+    Needs Pillow. Formats the installed Pillow cannot encode are skipped.
+    """
+    from PIL import features
+
+    available = [fmt for fmt in formats if features.check(fmt)]
+    for fmt in set(formats) - set(available):
+        echo(f'skipping {fmt}: not supported by this Pillow build')
+
+    build_dir = os.path.join(static_folder, 'build')
+    manifest = {}
+    for folder, dirs, files in os.walk(static_folder):
+        dirs[:] = [d for d in dirs if os.path.join(folder, d) != build_dir]
+        for name in sorted(files):
+            path = os.path.join(folder, name)
+            relative = os.path.relpath(path, static_folder).replace(os.sep, '/')
+            if name.lower().endswith(IMAGE_EXTENSIONS):
+                manifest[relative] = build_image(path, relative, build_dir, available)
+            else:
+                with open(path, 'rb') as f:
+                    data = f.read()
+                src = hashed_name(relative, data)
+                write_file(build_dir, src, data)
+                manifest[relative] = {'src': 'build/' + src}
+            echo(f'{relative} -> {manifest[relative]["src"]}')
+
+    with open(os.path.join(build_dir, 'manifest.json'), 'w') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    return manifest
+
+
+class AssetManifest:
+    """Serves the output of `flask build-assets` to the templates.
+
+    url_for('static', filename=...) returns the content-hashed file when it is
+    in the manifest, and picture()/srcset() offer the AVIF/WebP variants.
+    Without a build everything falls back to the original files. The
+    manifest of each application is kept in app.extensions['assets'].
+    """
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.load(app)
+
+        app.jinja_env.globals.update(url_for=self.url_for, srcset=self.srcset, picture=self.picture)
+        app.after_request(self.cache_headers)
+
+        @app.cli.command('build-assets')
+        @click.option('--format', 'formats', multiple=True, default=('webp', 'avif'),
+                      type=click.Choice(sorted(IMAGE_FORMATS)))
+        def build_assets_command(formats):
+            """Build hashed static files and responsive image variants."""
+            build_assets(app.static_folder, formats, echo=click.echo)
+            self.load(app)
+
+    def load(self, app):
+        try:
+            with open(os.path.join(app.static_folder, 'build', 'manifest.json'), 'rb') as f:
+                data = f.read()
+        except FileNotFoundError:
+            app.extensions['assets'] = Manifest({}, None)
+            return
+        app.extensions['assets'] = Manifest(json.loads(data), content_hash(data))
+
+    @property
+    def manifest(self):
+        return current_app.extensions['assets'].entries
+
+    def url_for(self, endpoint, **values):
+        if endpoint == 'static':
+            entry = self.manifest.get(values.get('filename'))
+            if entry:
+                values['filename'] = entry['src']
+        return url_for(endpoint, **values)
+
+    def srcset(self, filename, fmt='webp'):
+        entry = self.manifest.get(filename, {})
+        return ', '.join(f'{url_for("static", filename=name)} {width}w'
+                         for width, name in entry.get('variants', {}).get(fmt, []))
+
+    def picture(self, filename, alt='', sizes='100vw', **attrs):
+        """<picture> with AVIF/WebP sources and the original as <img> fallback."""
+        img_attrs = ''.join(f' {key}="{escape(value)}"' for key, value in attrs.items())
+        img = f'<img src="{escape(self.url_for("static", filename=filename))}" alt="{escape(alt)}"{img_attrs}>'
+
+        sources = ''.join(
+            f'<source type="image/{fmt}" srcset="{escape(self.srcset(filename, fmt))}" sizes="{escape(sizes)}">'
+            for fmt in ('avif', 'webp') if self.srcset(filename, fmt))
+        if not sources:
+            return Markup(img)
+        return Markup(f'<picture>{sources}{img}</picture>')
+
+    def cache_headers(self, response):
+        # Hashed files never change under the same name
+        if request.endpoint == 'static' and (request.view_args or {}).get('filename', '').startswith('build/'):
+            response.cache_control.no_cache = None
+            response.cache_control.public = True
+            response.cache_control.max_age = ONE_YEAR
+            response.cache_control.immutable = True
+        return response
@@ -0,0 +1,107 @@
+from bisect import bisect_right
+from collections import namedtuple
+from datetime import datetime, time, timedelta
+
+
+# Bookings are stored as CELL_MINUTES cells (app.BookingCell); starts, ends
+# and durations must fall on this grid
+CELL_MINUTES = 5
+
+Slot = namedtuple('Slot', ['practitioner_id', 'starts_at'])
+
+
+class IntervalIndex:
+    """Busy time of one practitioner: sorted, merged [start, end) intervals.
+
+    A free-gap walk starts with a binary search over the interval ends, so it
+    costs O(log n) plus the gaps it returns, however many bookings the
+    practitioner has.
+    """
+
+    def __init__(self, intervals=()):
+        merged = []
+        for start, end in sorted(intervals):
+            if merged and start <= merged[-1][1]:
+                merged[-1][1] = max(merged[-1][1], end)
+            else:
+                merged.append([start, end])
+        self.starts = [start for start, _ in merged]
+        self.ends = [end for _, end in merged]
+
+    def free(self, start, end):
+        """Yield the free (start, end) gaps inside [start, end)."""
+        i = bisect_right(self.ends, start)
+        cursor = start
+        while i < len(self.starts) and self.starts[i] < end:
+            if self.starts[i] > cursor:
+                yield cursor, self.starts[i]
+            cursor = max(cursor, self.ends[i])
+            i += 1
+        if cursor < end:
+            yield cursor, end
+
+
+def cells(start, end):
+    """The CELL_MINUTES cells covered by [start, end)."""
+    step = timedelta(minutes=CELL_MINUTES)
+    while start < end:
+        yield start
+        start += step
+
+
+def on_grid(moment, minutes):
+    return moment.second == 0 and moment.microsecond == 0 and (moment.hour * 60 + moment.minute) % minutes == 0
+
+
+def align_up(moment, minutes):
+    """First time at or after `moment` on the day's `minutes` grid."""
+    midnight = datetime.combine(moment.date(), time())
+    elapsed = (moment - midnight) / timedelta(minutes=1)
+    return midnight + timedelta(minutes=-(-elapsed // minutes) * minutes)
+
+
+def working_windows(hours, start, end):
+    """(start, end) windows from weekly hours, clipped to [start, end).
+
+    `hours` maps a weekday (0 = Monday) to (start_minute, end_minute) pairs.
+    """
+    day = start.date()
+    while datetime.combine(day, time()) < end:
+        midnight = datetime.combine(day, time())
+        for open_minute, close_minute in hours.get(day.weekday(), ()):
+            window_start = max(start, midnight + timedelta(minutes=open_minute))
+            window_end = min(end, midnight + timedelta(minutes=close_minute))
+            if window_start < window_end:
+                yield window_start, window_end
+        day += timedelta(days=1)
+
+
+def free_slots(index, windows, duration, step):
+    """Start times on the `step`-minute grid where `duration` fits between bookings."""
+    for window_start, window_end in windows:
+        for gap_start, gap_end in index.free(window_start, window_end):
+            moment = align_up(gap_start, step)
+            while moment + duration <= gap_end:
+                yield moment
+                moment += timedelta(minutes=step)
+
+
+def find_slots(practitioner_ids, hours, busy, start, end, duration, step):
+    """Free slots of `duration` for each practitioner between `start` and `end`.
+
+    `hours` maps practitioner_id to its weekly hours (see working_windows)
+    and `busy` is an iterable of (practitioner_id, starts_at, ends_at) rows,
+    e.g. one query over the bookings of the range. Returns Slots ordered by
+    time, then practitioner.
+    """
+    intervals = {practitioner_id: [] for practitioner_id in practitioner_ids}
+    for practitioner_id, starts_at, ends_at in busy:
+        intervals[practitioner_id].append((starts_at, ends_at))
+
+    slots = []
+    for practitioner_id, booked in intervals.items():
+        index = IntervalIndex(booked)
+        windows = working_windows(hours.get(practitioner_id, {}), start, end)
+        slots.extend(Slot(practitioner_id, moment) for moment in free_slots(index, windows, duration, step))
+    slots.sort(key=lambda slot: (slot.starts_at, slot.practitioner_id))
+    return slots
@@ -0,0 +1,171 @@
+"""Appointment availability over many practitioners and months of bookings.
+
+    python benchmarks/availability_benchmark.py --practitioners 50 --weeks 26
+
+Seeds practitioners working weekdays 08:00-18:00 with about 60% of their
+time booked from `weeks`/2 weeks ago to `weeks`/2 weeks ahead. Then it times:
+
+    engine     app.find_availability: three queries, one interval index per practitioner
+    per-slot   one overlap query per candidate start time (the obvious alternative)
+
+and fires concurrent bookings at the same slot to check that exactly one wins.
+"""
+import argparse
+import random
+import statistics
+import threading
+import time
+from datetime import date, datetime, timedelta
+
+from sqlalchemy import select, text
+
+from common import load_app  # first: puts the repository on sys.path
+from availability import align_up, cells, working_windows
+
+ROLE = 'Practice Physiotherapist'
+PRODUCT_ID = 1
+DURATION = 40
+
+
+def seed(module, practitioners, weeks, seed=1):
+    rnd = random.Random(seed)
+    db = module.db
+    monday = date.today() - timedelta(days=date.today().weekday())
+    first_day = monday - timedelta(weeks=weeks // 2)
+
+    with module.app.app_context():
+        db.session.execute(module.Product.__table__.insert(), [{
+            'product_id': PRODUCT_ID, 'name': f'{ROLE} Initial Consultation ({DURATION}mins)', 'price': 125,
+            'duration_minutes': DURATION, 'practitioner_role': ROLE}])
+        db.session.execute(module.Practitioner.__table__.insert(), [
+            {'id': n, 'name': f'Practitioner {n}', 'role': ROLE} for n in range(1, practitioners + 1)])
+        db.session.execute(module.WorkingHours.__table__.insert(), [
+            {'practitioner_id': n, 'weekday': weekday, 'start_minute': 8 * 60, 'end_minute': 18 * 60}
+            for n in range(1, practitioners + 1) for weekday in range(5)])
+
+        bookings, booking_cells = [], []
+        for n in range(1, practitioners + 1):
+            for offset in range(weeks * 7):
+                day = first_day + timedelta(days=offset)
+                if day.weekday() >= 5:
+                    continue
+                moment = datetime.combine(day, datetime.min.time()) + timedelta(hours=8)
+                closing = moment + timedelta(hours=10)
+                while True:
+                    moment += timedelta(minutes=rnd.choice([0, 0, 10, 20, 30]))
+                    ends_at = moment + timedelta(minutes=rnd.choice([30, 40]))
+                    if ends_at > closing:
+                        break
+                    booking_id = len(bookings) + 1
+                    bookings.append({'id': booking_id, 'practitioner_id': n, 'product_id': PRODUCT_ID,
+                                     'starts_at': moment, 'ends_at': ends_at})
+                    booking_cells.extend({'practitioner_id': n, 'starts_at': cell, 'booking_id': booking_id}
+                                         for cell in cells(moment, ends_at))
+                    moment = ends_at
+        db.session.execute(module.Booking.__table__.insert(), bookings)
+        db.session.execute(module.BookingCell.__table__.insert(), booking_cells)
+        db.session.commit()
+        module.catalog.invalidate()
+    return len(bookings)
+
+
+def per_slot_availability(module, product, start, end):
+    """Free slots found by asking the database about every candidate start."""
+    db, Booking = module.db, module.Booking
+    step, duration = module.app.config['APPOINTMENT_SLOT_STEP'], timedelta(minutes=product.duration_minutes)
+    start = max(start, datetime.now())
+    ids = db.session.execute(select(module.Practitioner.id).where(
+        module.Practitioner.role == product.practitioner_role)).scalars().all()
+    hours = {}
+    for row in db.session.execute(select(module.WorkingHours)).scalars():
+        hours.setdefault(row.practitioner_id, {}).setdefault(row.weekday, []).append(
+            (row.start_minute, row.end_minute))
+
+    slots, queries = [], 0
+    for practitioner_id in ids:
+        for window_start, window_end in working_windows(hours.get(practitioner_id, {}), start, end):
+            moment = align_up(window_start, step)
+            while moment + duration <= window_end:
+                queries += 1
+                taken = db.session.execute(select(Booking.id).where(
+                    Booking.practitioner_id == practitioner_id,
+                    Booking.starts_at < moment + duration, Booking.ends_at > moment).limit(1)).first()
+                if taken is None:
+                    slots.append((practitioner_id, moment))
+                moment += timedelta(minutes=step)
+    return slots, queries
+
+
+def timed(work, repeat):
+    samples, result = [], None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = work()
+        samples.append((time.perf_counter() - start) * 1000)
+    return result, statistics.median(samples), max(samples)
+
+
+def race(module, shoppers):
+    """`shoppers` threads book the same free slot at once; returns (booked, refused, overlaps)."""
+    with module.app.app_context():
+        product = module.catalog.get(PRODUCT_ID)
+        tomorrow = datetime.combine(date.today() + timedelta(days=1), datetime.min.time())
+        slot = module.find_availability(product, tomorrow, tomorrow + timedelta(days=7))[0]
+
+    barrier = threading.Barrier(shoppers)
+    statuses = []
+
+    def shopper(n):
+        client = module.app.test_client()
+        barrier.wait()
+        response = client.post('/api/bookings', data={
+            'first_name': 'Race', 'last_name': str(n), 'cell_phone': '0400000000',
+            'email': f'race{n}@example.com', 'product_id': PRODUCT_ID,
+            'practitioner_id': slot.practitioner_id, 'starts_at': slot.starts_at.isoformat(timespec='minutes')})
+        statuses.append(response.status_code)
+
+    threads = [threading.Thread(target=shopper, args=(n,)) for n in range(shoppers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    with module.app.app_context():
+        overlaps = module.db.session.execute(text(
+            'SELECT count(*) FROM booking AS a JOIN booking AS b ON a.practitioner_id = b.practitioner_id '
+            'AND a.id < b.id AND a.starts_at < b.ends_at AND b.starts_at < a.ends_at')).scalar()
+    return statuses.count(201), statuses.count(409), overlaps
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--practitioners', type=int, default=50)
+    parser.add_argument('--weeks', type=int, default=26, help='weeks of bookings, half past and half ahead')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--shoppers', type=int, default=16, help='concurrent bookings of one slot')
+    args = parser.parse_args()
+
+    module = load_app(METRICS_ENABLED=0)
+    start = time.perf_counter()
+    bookings = seed(module, args.practitioners, args.weeks)
+    print(f'{args.practitioners} practitioners, {bookings} bookings seeded in {time.perf_counter() - start:.1f} s')
+
+    print(f'{"range":<10}{"method":<10}{"slots":>8}{"queries":>9}{"p50 ms":>10}{"max ms":>10}')
+    with module.app.app_context():
+        product = module.catalog.get(PRODUCT_ID)
+        today = datetime.combine(date.today(), datetime.min.time())
+        for days in (7, 31):
+            end = today + timedelta(days=days)
+            slots, p50, worst = timed(lambda: module.find_availability(product, today, end), args.repeat)
+            print(f'{days:>3} days  {"engine":<10}{len(slots):>8}{3:>9}{p50:>10.1f}{worst:>10.1f}')
+            (slots, queries), p50, worst = timed(
+                lambda: per_slot_availability(module, product, today, end), max(1, args.repeat // 5))
+            print(f'{days:>3} days  {"per-slot":<10}{len(slots):>8}{queries:>9}{p50:>10.1f}{worst:>10.1f}')
+
+    won, refused, overlaps = race(module, args.shoppers)
+    print(f'{args.shoppers} concurrent bookings of one slot: {won} booked, {refused} refused, '
+          f'{overlaps} overlapping bookings')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,95 @@
+"""Run N shoppers in parallel and check their carts stay separate.
+
+Each thread has its own test client (its own session cookie), adds a few
+treatments, opens the cart and checks out. Afterwards every order must hold
+exactly that shopper's items. Wall time for the parallel run is compared with
+running the same sessions one after another.
+
+    python benchmarks/cart_concurrency.py --sessions 16 --backend cookie
+    python benchmarks/cart_concurrency.py --sessions 16 --backend db
+"""
+import argparse
+import random
+import threading
+import time
+
+from common import load_app, seed_products
+
+
+def shop(module, shopper, items, errors):
+    client = module.app.test_client()
+    for product_id, quantity in items:
+        client.post('/add_to_cart', data={'product_id': product_id, 'quantity': quantity})
+
+    response = client.get('/cart.html')
+    if response.status_code != 200:
+        errors.append(f'shopper {shopper}: cart returned {response.status_code}')
+
+    response = client.post('/proc_checkout', data={
+        'first_name': 'Shopper', 'last_name': str(shopper),
+        'cell_phone': '0400000000', 'email': f'shopper{shopper}@example.com'})
+    if response.status_code != 302:
+        errors.append(f'shopper {shopper}: checkout returned {response.status_code}')
+
+
+def run(module, baskets, parallel):
+    errors = []
+    start = time.perf_counter()
+    if parallel:
+        threads = [threading.Thread(target=shop, args=(module, shopper, items, errors))
+                   for shopper, items in baskets.items()]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    else:
+        for shopper, items in baskets.items():
+            shop(module, shopper, items, errors)
+    return time.perf_counter() - start, errors
+
+
+def check_orders(module, baskets):
+    problems = []
+    with module.app.app_context():
+        for shopper, items in baskets.items():
+            customer = module.Customer.query.filter_by(last_name=str(shopper)).order_by(
+                module.Customer.id.desc()).first()
+            order = customer.orders[-1] if customer and customer.orders else None
+            got = sorted((item.product_id, item.quantity) for item in order.items) if order else []
+            if got != sorted(items):
+                problems.append(f'shopper {shopper}: expected {sorted(items)}, got {got}')
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sessions', type=int, default=16)
+    parser.add_argument('--items', type=int, default=4)
+    parser.add_argument('--backend', choices=['cookie', 'db'], default='cookie')
+    args = parser.parse_args()
+
+    module = load_app(CART_BACKEND=args.backend)
+    seed_products(module)
+
+    rnd = random.Random(7)
+    # Distinct products per basket so merged cart lines compare one to one
+    baskets = {shopper: [(product_id, rnd.randint(1, 5))
+                         for product_id in rnd.sample(range(1, 8), args.items)]
+               for shopper in range(args.sessions)}
+
+    serial, errors = run(module, baskets, parallel=False)
+    errors += check_orders(module, baskets)
+    parallel, parallel_errors = run(module, baskets, parallel=True)
+    errors += parallel_errors + check_orders(module, baskets)
+
+    print(f'backend={args.backend} sessions={args.sessions} items={args.items}')
+    print(f'serial   {serial * 1000:8.1f} ms')
+    print(f'parallel {parallel * 1000:8.1f} ms')
+    for error in errors:
+        print('FAIL', error)
+    print('OK' if not errors else f'{len(errors)} problem(s)')
+    raise SystemExit(1 if errors else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,108 @@
+"""Orders per second for the old three-commit checkout and place_order().
+
+Every submitter thread checks out its own pre-filled carts (cart_item rows
+with a per-cart key), so both variants read and clear the same data:
+
+  legacy  commit the customer, add order items one by one and commit,
+          then delete the cart and commit again
+  atomic  place_order() plus the cart delete in a single transaction
+
+    python benchmarks/checkout_benchmark.py --submitters 8 --orders 50
+"""
+import argparse
+import threading
+import time
+import uuid
+from types import SimpleNamespace
+
+from common import load_app, seed_products
+
+
+def fill_carts(module, count, lines):
+    keys = [uuid.uuid4().hex for _ in range(count)]
+    with module.app.app_context():
+        module.db.session.add_all(
+            module.CartItem(cart_key=key, product_id=product_id, quantity=2)
+            for key in keys for product_id in range(1, lines + 1))
+        module.db.session.commit()
+    return keys
+
+
+def customer_form(n):
+    field = SimpleNamespace
+    return SimpleNamespace(first_name=field(data='Bench'), last_name=field(data=str(n)),
+                           cell_phone=field(data='0400000000'), email=field(data=f'bench{n}@example.com'))
+
+
+def legacy_checkout(module, key, n):
+    db, form = module.db, customer_form(n)
+    customer = module.Customer(first_name=form.first_name.data, last_name=form.last_name.data,
+                               cell_phone=form.cell_phone.data, email=form.email.data)
+    db.session.add(customer)
+    db.session.commit()
+
+    cart_items = module.CartItem.query.filter_by(cart_key=key).all()
+    order = module.Order(customer_id=customer.id)
+    for cart_item in cart_items:
+        db.session.add(module.OrderItem(order=order, product_id=cart_item.product_id,
+                                        quantity=cart_item.quantity))
+    db.session.commit()
+
+    module.CartItem.query.filter_by(cart_key=key).delete()
+    db.session.commit()
+
+
+def atomic_checkout(module, key, n):
+    db = module.db
+    lines = (module.CartItem.query.filter_by(cart_key=key)
+             .join(module.Product)
+             .with_entities(module.CartItem.product_id, module.CartItem.quantity,
+                            module.Product.price.label('unit_price'))
+             .all())
+    module.place_order(customer_form(n), lines, idempotency_key=uuid.uuid4().hex)
+    module.CartItem.query.filter_by(cart_key=key).delete()
+    db.session.commit()
+
+
+def run(module, checkout, submitters, orders, lines):
+    keys = fill_carts(module, submitters * orders, lines)
+    failures = []
+
+    def submitter(index):
+        with module.app.app_context():
+            for n in range(index * orders, (index + 1) * orders):
+                try:
+                    checkout(module, keys[n], n)
+                except Exception as exc:  # e.g. "database is locked"
+                    module.db.session.rollback()
+                    failures.append(exc)
+
+    threads = [threading.Thread(target=submitter, args=(i,)) for i in range(submitters)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    done = submitters * orders - len(failures)
+    return done / elapsed, len(failures)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--submitters', type=int, default=8)
+    parser.add_argument('--orders', type=int, default=50, help='orders per submitter')
+    parser.add_argument('--lines', type=int, default=5, help='cart lines per order')
+    args = parser.parse_args()
+
+    module = load_app(CART_BACKEND='db')
+    seed_products(module)
+
+    print(f'submitters={args.submitters} orders={args.orders} lines={args.lines}')
+    for name, checkout in (('legacy', legacy_checkout), ('atomic', atomic_checkout)):
+        rate, failed = run(module, checkout, args.submitters, args.orders, args.lines)
+        print(f'{name:<8}{rate:10.1f} orders/s  failed={failed}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,95 @@
+"""Cold start of one worker: import time and time to first request.
+
+Every run starts a fresh Python process, the way a server does when it adds
+a worker, and times:
+
+    import      importing the module (app.py, or wsgi.py which also builds
+                and warms the app)
+    create_app  building the application (app.py only)
+    first       the first request to each page, then a second one for comparison
+
+    python benchmarks/cold_start.py --runs 10
+    python benchmarks/cold_start.py --runs 10 --scale 100 --target wsgi
+
+`--target app` is a worker without warm-up (create_app() only); `--target
+wsgi` is the production entry point.
+"""
+import argparse
+import json
+import os
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from common import ROOT, synthetic_products
+
+PATHS = ['/', '/product_details', '/api/products', '/appointment.html', '/cart.html']
+
+# Runs in the fresh worker process; prints its timings as JSON
+WORKER = '''
+import json, sys, time
+start = time.perf_counter()
+if sys.argv[1] == 'wsgi':
+    import wsgi
+    imported = time.perf_counter()
+    app, created = wsgi.app, imported
+else:
+    import app as shop
+    imported = time.perf_counter()
+    app = shop.create_app()
+    created = time.perf_counter()
+timings = {'import': imported - start, 'create_app': created - imported}
+client = app.test_client()
+for path in sys.argv[2:]:
+    for attempt in ('first', 'second'):
+        t = time.perf_counter()
+        client.get(path)
+        timings[f'{attempt} {path}'] = time.perf_counter() - t
+print(json.dumps(timings))
+'''
+
+
+def seed_database(path, products):
+    subprocess.run([sys.executable, '-m', 'flask', '--app', 'app', 'init-db'], cwd=ROOT, check=True,
+                   env=dict(os.environ, DATABASE_URL='sqlite:///' + path))
+    with sqlite3.connect(path) as conn:
+        conn.executemany('INSERT INTO product (product_id, name, price, description1, description2) '
+                         'VALUES (?, ?, ?, ?, ?)', synthetic_products(products))
+
+
+def start_worker(target, env):
+    start = time.perf_counter()
+    result = subprocess.run([sys.executable, '-c', WORKER, target] + PATHS, cwd=ROOT, env=env,
+                            check=True, capture_output=True, text=True)
+    timings = json.loads(result.stdout.splitlines()[-1])
+    timings['process'] = time.perf_counter() - start
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--scale', type=int, default=1, help='catalog size multiplier (7 treatments each)')
+    parser.add_argument('--target', choices=['app', 'wsgi'], default='wsgi')
+    args = parser.parse_args()
+
+    database = os.path.join(tempfile.mkdtemp(prefix='haven-bench-'), 'bench.db')
+    seed_database(database, 7 * args.scale)
+    env = dict(os.environ, DATABASE_URL='sqlite:///' + database)
+    # wsgi.py will not start without one
+    env.setdefault('SECRET_KEY', 'cold-start-benchmark')
+
+    runs = [start_worker(args.target, env) for _ in range(args.runs)]
+
+    print(f'target={args.target} runs={args.runs} products={7 * args.scale}')
+    print(f'{"":<28}{"median ms":>10}{"max ms":>10}')
+    for name in runs[0]:
+        samples = [run[name] * 1000 for run in runs]
+        print(f'{name:<28}{statistics.median(samples):>10.1f}{max(samples):>10.1f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,91 @@
+"""Shared helpers for the benchmarks: a throwaway database and a seeded app."""
+import importlib
+import os
+import random
+import sys
+import tempfile
+from types import SimpleNamespace
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, ROOT)
+
+ROLES = ['Principal Physiotherapist', 'Practice Physiotherapist', 'Senior Physiotherapist',
+         'Sports Therapist', 'Neuro Physiotherapist', 'Hydrotherapist', 'Pilates Instructor']
+KINDS = ['Initial Consultation', 'Subsequent Consultation', 'Group Class', 'Home Exercise Program',
+         'Dry Needling', 'Massage', 'Rehabilitation Package', 'Assessment']
+WORDS = ('assessment treatment mobility strength posture balance flexibility injury recovery '
+         'shoulder knee spine hip ankle neck stroke vestibular concussion sports running '
+         'exercise program session progress education manual therapy stretching').split()
+
+
+def synthetic_products(count, seed=1):
+    """(product_id, name, price, description1, description2) rows."""
+    rnd = random.Random(seed)
+    for product_id in range(1, count + 1):
+        minutes = rnd.choice([30, 40, 45, 60])
+        name = f'{rnd.choice(ROLES)} {rnd.choice(KINDS)} ({minutes}mins)'
+        description1 = ' '.join(rnd.choice(WORDS) for _ in range(rnd.randint(80, 160)))
+        description2 = ' '.join(rnd.choice(WORDS) for _ in range(rnd.randint(10, 40)))
+        yield product_id, name, rnd.choice([60, 95, 105, 110, 125, 130, 350]), description1, description2
+
+
+def load_app(database=None, csrf=False, **env):
+    """Create the app against `database` or a fresh SQLite file in a temporary directory.
+
+    Extra keyword arguments are set as environment variables first, e.g.
+    CART_BACKEND='db'. Unless `csrf` is set, CSRF is switched off so the test
+    client can post forms directly.
+    """
+    if database is None:
+        database = os.path.join(tempfile.mkdtemp(prefix='haven-bench-'), 'bench.db')
+    os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.abspath(database)
+    os.environ.update({key: str(value) for key, value in env.items()})
+
+    shop = importlib.import_module('app')
+    app = shop.create_app({'WTF_CSRF_ENABLED': csrf})
+    with app.app_context():
+        shop.init_db()
+    # The app module's models and helpers, plus the application
+    return SimpleNamespace(**vars(shop), app=app)
+
+
+def seed_products(module, count=7):
+    with module.app.app_context():
+        module.db.session.add_all(
+            module.Product(product_id=product_id, name=f'Treatment {product_id} (30mins)',
+                           price=100 + product_id, description1='Synthetic treatment', description2='D2')
+            for product_id in range(1, count + 1))
+        module.db.session.commit()
+
+
+def seed_catalog(module, count, seed=1):
+    """Bulk-load `count` synthetic treatments in one transaction."""
+    with module.app.app_context():
+        module.db.session.execute(module.Product.__table__.insert(), [
+            dict(zip(('product_id', 'name', 'price', 'description1', 'description2'), row))
+            for row in synthetic_products(count, seed)
+        ])
+        module.db.session.commit()
+
+
+def seed_order_history(module, orders, products, seed=1, batch=5000):
+    """Add `orders` past orders (1-4 lines each) from repeat customers."""
+    rnd = random.Random(seed)
+    db = module.db
+    customers = max(1, orders // 3)
+    with module.app.app_context():
+        db.session.execute(module.Customer.__table__.insert(), [
+            {'id': n, 'first_name': 'Patient', 'last_name': str(n),
+             'cell_phone': f'04{n:08d}', 'email': f'patient{n}@example.com'}
+            for n in range(1, customers + 1)
+        ])
+        for start in range(1, orders + 1, batch):
+            ids = range(start, min(orders, start + batch - 1) + 1)
+            db.session.execute(module.Order.__table__.insert(), [
+                {'id': order_id, 'customer_id': rnd.randint(1, customers)} for order_id in ids])
+            db.session.execute(module.OrderItem.__table__.insert(), [
+                {'order_id': order_id, 'product_id': rnd.randint(1, products),
+                 'quantity': rnd.randint(1, 5), 'unit_price': rnd.choice([105, 110, 125, 130])}
+                for order_id in ids for _ in range(rnd.randint(1, 4))])
+        db.session.commit()
+        module.rebuild_sales()
@@ -0,0 +1,115 @@
+"""Mixed read/write load against each DB_PROFILE, before/after style.
+
+Each profile runs in its own process (the engine is configured at import)
+with a fresh database. Worker threads loop for --seconds: writes add to a
+DB-backed cart and check out, reads render the cart and run a search.
+
+    python benchmarks/db_profile_load.py --threads 16 --seconds 10 --write-ratio 0.3
+"""
+import argparse
+import json
+import logging
+import os
+import random
+import statistics
+import subprocess
+import sys
+import threading
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+def percentile(samples, pct):
+    if not samples:
+        return 0.0
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(len(samples) * pct / 100))]
+
+
+def worker(module, deadline, write_ratio, seed, results):
+    rnd = random.Random(seed)
+    client = module.app.test_client()
+    reads, writes, errors = [], [], 0
+    client.post('/add_to_cart', data={'product_id': 1, 'quantity': 1})
+
+    while time.perf_counter() < deadline:
+        start = time.perf_counter()
+        if rnd.random() < write_ratio:
+            if rnd.random() < 0.2:
+                response = client.post('/proc_checkout', data={
+                    'first_name': 'Load', 'last_name': str(seed), 'cell_phone': '0400000000',
+                    'email': f'load{seed}@example.com'})
+            else:
+                response = client.post('/add_to_cart', data={
+                    'product_id': rnd.randint(1, 7), 'quantity': rnd.randint(1, 3)})
+            samples = writes
+        else:
+            if rnd.random() < 0.5:
+                response = client.get('/cart.html')
+            else:
+                response = client.post('/product_search', data={'search_query': 'treatment'})
+            samples = reads
+        samples.append((time.perf_counter() - start) * 1000)
+        if response.status_code >= 500:
+            errors += 1
+    results.append((reads, writes, errors))
+
+
+def run_profile(args):
+    sys.path.insert(0, HERE)
+    from common import load_app, seed_products
+
+    module = load_app(DB_PROFILE=args.profile, CART_BACKEND='db')
+    module.app.logger.setLevel(logging.CRITICAL)
+    seed_products(module)
+
+    results = []
+    deadline = time.perf_counter() + args.seconds
+    threads = [threading.Thread(target=worker, args=(module, deadline, args.write_ratio, i, results))
+               for i in range(args.threads)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    reads = [ms for r, _, _ in results for ms in r]
+    writes = [ms for _, w, _ in results for ms in w]
+    summary = {
+        'profile': args.profile,
+        'ops_per_sec': (len(reads) + len(writes)) / args.seconds,
+        'read_p50': statistics.median(reads) if reads else 0.0,
+        'read_p95': percentile(reads, 95),
+        'write_p50': statistics.median(writes) if writes else 0.0,
+        'write_p95': percentile(writes, 95),
+        'errors': sum(e for _, _, e in results),
+    }
+    print('RESULT ' + json.dumps(summary))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--threads', type=int, default=16)
+    parser.add_argument('--seconds', type=float, default=10)
+    parser.add_argument('--write-ratio', type=float, default=0.3)
+    parser.add_argument('--profile', help='run a single profile in this process')
+    args = parser.parse_args()
+
+    if args.profile:
+        run_profile(args)
+        return
+
+    print(f'threads={args.threads} seconds={args.seconds} write_ratio={args.write_ratio}')
+    print(f'{"profile":<12}{"ops/s":>9}{"read p50":>10}{"read p95":>10}{"write p50":>11}{"write p95":>11}{"errors":>8}')
+    for profile in ('default', 'production'):
+        output = subprocess.run(
+            [sys.executable, __file__, '--profile', profile, '--threads', str(args.threads),
+             '--seconds', str(args.seconds), '--write-ratio', str(args.write_ratio)],
+            capture_output=True, text=True, check=True).stdout
+        result = json.loads(output.rsplit('RESULT ', 1)[1])
+        print(f'{profile:<12}{result["ops_per_sec"]:>9.1f}{result["read_p50"]:>10.1f}{result["read_p95"]:>10.1f}'
+              f'{result["write_p50"]:>11.1f}{result["write_p95"]:>11.1f}{result["errors"]:>8}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,245 @@
+"""End-to-end shop journey benchmark with baselines.
+
+Every virtual user repeats the full journey with its own cookies and real
+CSRF tokens:
+
+    landing -> product_search -> product_details -> add_to_cart -> cart
+            -> do_checkout -> proc_checkout
+
+A journey also fails if the page-cached landing page comes back with
+Vary: Cookie, which would stop shared caches from storing it once.
+
+In-process (Flask test client, seeded throwaway database):
+
+    python benchmarks/journey.py run --users 8 --journeys 20 --scale 10
+    python benchmarks/journey.py run --save-baseline baseline.json
+    python benchmarks/journey.py run --compare baseline.json --tolerance 0.25
+
+Over HTTP against a running server (seed its database first):
+
+    python benchmarks/journey.py seed --database /tmp/haven.db --scale 100
+    DATABASE_URL=sqlite:////tmp/haven.db python app.py
+    python benchmarks/journey.py run --url http://127.0.0.1:5000
+
+Scale 1 is today's size: 7 treatments and 1,000 past orders.
+"""
+import argparse
+import http.cookiejar
+import json
+import random
+import re
+import statistics
+import sys
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+
+from common import load_app, seed_catalog, seed_order_history
+
+BASE_PRODUCTS = 7
+BASE_ORDERS = 1000
+STEPS = ['landing', 'product_search', 'product_details', 'add_to_cart', 'cart', 'do_checkout', 'proc_checkout']
+SEARCHES = ['initial consultation', 'physio', 'group class', 'massage', 'assessment']
+
+CSRF_RE = re.compile(r'name="csrf_token"[^>]*value="([^"]+)"')
+CHECKOUT_TOKEN_RE = re.compile(r'name="checkout_token" value="([^"]+)"')
+PRODUCT_RE = re.compile(r'name="product_id" value="(\d+)"')
+
+
+class TestClient:
+    def __init__(self, module):
+        self.client = module.app.test_client()
+
+    def request(self, method, path, data=None):
+        response = self.client.open(path, method=method, data=data)
+        return response.status_code, response.get_data(as_text=True), response.headers
+
+
+class NoRedirect(urllib.request.HTTPRedirectHandler):
+    def redirect_request(self, *args, **kwargs):
+        return None
+
+
+class HttpClient:
+    def __init__(self, base_url):
+        self.base_url = base_url.rstrip('/')
+        self.opener = urllib.request.build_opener(
+            urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar()), NoRedirect)
+
+    def request(self, method, path, data=None):
+        body = urllib.parse.urlencode(data).encode() if data is not None else None
+        req = urllib.request.Request(self.base_url + path, data=body, method=method)
+        try:
+            with self.opener.open(req, timeout=30) as response:
+                return response.status, response.read().decode(), response.headers
+        except urllib.error.HTTPError as error:
+            return error.code, error.read().decode(), error.headers
+
+
+def varies_on_cookie(headers):
+    vary = ','.join(headers.get_all('Vary') or [])
+    return 'cookie' in {value.strip().lower() for value in vary.split(',')}
+
+
+def journey(client, rnd, user, timings):
+    def step(name, method, path, data=None, expect=200, shared=False):
+        start = time.perf_counter()
+        status, body, headers = client.request(method, path, data)
+        timings[name].append((time.perf_counter() - start) * 1000)
+        if status not in (expect if isinstance(expect, tuple) else (expect,)):
+            raise RuntimeError(f'{name}: HTTP {status}')
+        # Shared (page-cached) responses must be storable once for every visitor
+        if shared and 'no-store' not in headers.get('Cache-Control', '') and varies_on_cookie(headers):
+            raise RuntimeError(f'{name}: cached page sent Vary: Cookie')
+        return body
+
+    step('landing', 'GET', '/', shared=True)
+    # The landing page is cached without a token (see page_cache.py)
+    csrf = json.loads(client.request('GET', '/csrf_token')[1])['csrf_token']
+
+    body = step('product_search', 'POST', '/product_search',
+                {'search_query': rnd.choice(SEARCHES), 'csrf_token': csrf}, expect=(200, 302))
+    body = step('product_details', 'POST', '/product_details', {'csrf_token': csrf})
+    product_id = rnd.choice(PRODUCT_RE.findall(body))
+    csrf = CSRF_RE.search(body).group(1)
+
+    step('add_to_cart', 'POST', '/add_to_cart',
+         {'product_id': product_id, 'quantity': rnd.randint(1, 3), 'csrf_token': csrf}, expect=302)
+    body = step('cart', 'GET', '/cart.html')
+    csrf = CSRF_RE.search(body).group(1)
+
+    body = step('do_checkout', 'POST', '/do_checkout', {'csrf_token': csrf})
+    step('proc_checkout', 'POST', '/proc_checkout', {
+        'csrf_token': CSRF_RE.search(body).group(1),
+        'checkout_token': CHECKOUT_TOKEN_RE.search(body).group(1),
+        'first_name': 'Load', 'last_name': f'User{user}', 'cell_phone': '0400000000',
+        'email': f'load{user}@example.com'}, expect=302)
+
+
+def percentile(samples, pct):
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(len(samples) * pct / 100))] if samples else 0.0
+
+
+def run(args):
+    if args.url:
+        make_client = lambda: HttpClient(args.url)  # noqa: E731
+    else:
+        module = load_app(csrf=True, CART_BACKEND=args.cart_backend, METRICS_ENABLED=0)
+        seed_catalog(module, BASE_PRODUCTS * args.scale)
+        seed_order_history(module, BASE_ORDERS * args.scale, BASE_PRODUCTS * args.scale)
+        make_client = lambda: TestClient(module)  # noqa: E731
+
+    timings = {name: [] for name in STEPS}
+    lock = threading.Lock()
+    completed, failures = [0], []
+
+    def user(index):
+        client, rnd = make_client(), random.Random(index)
+        local = {name: [] for name in STEPS}
+        done = 0
+        for _ in range(args.journeys):
+            try:
+                journey(client, rnd, index, local)
+                done += 1
+            except Exception as exc:
+                failures.append(str(exc))
+        with lock:
+            completed[0] += done
+            for name in STEPS:
+                timings[name].extend(local[name])
+
+    threads = [threading.Thread(target=user, args=(i,)) for i in range(args.users)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    requests = sum(len(samples) for samples in timings.values())
+    result = {
+        'users': args.users, 'scale': args.scale, 'target': args.url or 'in-process',
+        'journeys_per_sec': completed[0] / elapsed,
+        'requests_per_sec': requests / elapsed,
+        'failures': len(failures),
+        'steps': {name: {'count': len(samples),
+                         'p50': statistics.median(samples) if samples else 0.0,
+                         'p95': percentile(samples, 95),
+                         'p99': percentile(samples, 99)}
+                  for name, samples in timings.items()},
+    }
+    return result, failures
+
+
+def report(result):
+    print(f'target={result["target"]} users={result["users"]} scale={result["scale"]}')
+    print(f'{result["journeys_per_sec"]:.1f} journeys/s, {result["requests_per_sec"]:.1f} requests/s, '
+          f'{result["failures"]} failed journeys')
+    print(f'{"step":<16}{"count":>7}{"p50 ms":>9}{"p95 ms":>9}{"p99 ms":>9}')
+    for name, step in result['steps'].items():
+        print(f'{name:<16}{step["count"]:>7}{step["p50"]:>9.1f}{step["p95"]:>9.1f}{step["p99"]:>9.1f}')
+
+
+def compare(result, baseline, tolerance):
+    """Steps whose p95 grew by more than `tolerance` (0.2 = 20%) over the baseline."""
+    regressions = []
+    for name, step in result['steps'].items():
+        before = baseline['steps'].get(name)
+        if before and before['p95'] > 0 and step['p95'] > before['p95'] * (1 + tolerance):
+            regressions.append(f'{name}: p95 {before["p95"]:.1f} -> {step["p95"]:.1f} ms')
+    if result['journeys_per_sec'] < baseline['journeys_per_sec'] * (1 - tolerance):
+        regressions.append(f'throughput: {baseline["journeys_per_sec"]:.1f} -> '
+                           f'{result["journeys_per_sec"]:.1f} journeys/s')
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    seed = commands.add_parser('seed', help='create and seed a database file for HTTP runs')
+    seed.add_argument('--database', required=True)
+    seed.add_argument('--scale', type=int, default=1)
+
+    run_parser = commands.add_parser('run', help='run the journey')
+    run_parser.add_argument('--url', help='base URL of a running server; default is in-process')
+    run_parser.add_argument('--users', type=int, default=8)
+    run_parser.add_argument('--journeys', type=int, default=20, help='journeys per user')
+    run_parser.add_argument('--scale', type=int, default=1, help='catalog and order history multiplier')
+    run_parser.add_argument('--cart-backend', choices=['cookie', 'db'], default='cookie')
+    run_parser.add_argument('--save-baseline', metavar='FILE')
+    run_parser.add_argument('--compare', metavar='FILE')
+    run_parser.add_argument('--tolerance', type=float, default=0.2)
+    args = parser.parse_args()
+
+    if args.command == 'seed':
+        module = load_app(database=args.database)
+        seed_catalog(module, BASE_PRODUCTS * args.scale)
+        seed_order_history(module, BASE_ORDERS * args.scale, BASE_PRODUCTS * args.scale)
+        print(f'seeded {args.database} at scale {args.scale}')
+        return
+
+    result, failures = run(args)
+    report(result)
+    for failure in sorted(set(failures))[:10]:
+        print('FAIL', failure)
+
+    if args.save_baseline:
+        with open(args.save_baseline, 'w') as f:
+            json.dump(result, f, indent=2)
+        print(f'baseline written to {args.save_baseline}')
+
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(result, json.load(f), args.tolerance)
+        for regression in regressions:
+            print('REGRESSION', regression)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
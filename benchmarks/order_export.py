@@ -0,0 +1,60 @@
+"""Memory and speed of the streaming order export.
+
+    python benchmarks/order_export.py --orders 20000 200000
+
+Exports every order line through /staff/orders.<format> for each order
+count and reports rows/s and the peak Python memory while streaming, next
+to loading the same rows with .all(). The streamed peak should stay flat as
+the order count grows.
+"""
+import argparse
+import time
+import tracemalloc
+
+from common import load_app, seed_catalog, seed_order_history
+
+TOKEN = 'bench'
+
+
+def measure(work):
+    tracemalloc.start()
+    start = time.perf_counter()
+    count = work()
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return count, elapsed, peak / 2**20
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--orders', type=int, nargs='+', default=[20000, 200000])
+    parser.add_argument('--format', choices=['csv', 'ndjson'], default='csv')
+    args = parser.parse_args()
+
+    print(f'{"orders":>8}{"method":>10}{"rows":>9}{"rows/s":>10}{"peak MB":>9}')
+    for orders in args.orders:
+        module = load_app(STAFF_TOKEN=TOKEN, METRICS_ENABLED=0)
+        seed_catalog(module, 70)
+        seed_order_history(module, orders, 70)
+        client = module.app.test_client()
+
+        def stream():
+            response = client.get(f'/staff/orders.{args.format}', buffered=False,
+                                  headers={'Authorization': f'Bearer {TOKEN}'})
+            lines = sum(chunk.count(b'\n') for chunk in response.response)
+            response.close()
+            return lines - (args.format == 'csv')
+
+        def materialize():
+            with module.app.app_context():
+                return len(module.db.session.query(module.Order, module.OrderItem)
+                           .join(module.OrderItem, module.OrderItem.order_id == module.Order.id).all())
+
+        for name, work in (('stream', stream), ('all()', materialize)):
+            rows, elapsed, peak = measure(work)
+            print(f'{orders:>8}{name:>10}{rows:>9}{rows / elapsed:>10.0f}{peak:>9.1f}')
+
+
+if __name__ == '__main__':
+    main()
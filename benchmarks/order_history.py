@@ -0,0 +1,68 @@
+"""Order history by email on a large order table.
+
+    python benchmarks/order_history.py --orders 300000 --lookups 2000
+
+Seeds the order history, prints the SQLite query plans of app.order_history
+(every step should be a COVERING INDEX search) and times random lookups.
+"""
+import argparse
+import random
+import statistics
+import time
+
+from sqlalchemy import select, text
+from sqlalchemy.dialects import sqlite
+
+from common import load_app, seed_catalog, seed_order_history
+
+
+def query_plans(module):
+    recent = (select(module.Order.id).where(module.Order.customer_id == 1)
+              .order_by(module.Order.id.desc()).limit(20))
+    queries = [
+        select(module.Customer.id).where(module.Customer.email == 'patient1@example.com'),
+        select(module.OrderItem.order_id, module.OrderItem.product_id,
+               module.OrderItem.quantity, module.OrderItem.unit_price)
+        .where(module.OrderItem.order_id.in_(recent.scalar_subquery()))
+        .order_by(module.OrderItem.order_id.desc()),
+    ]
+    for query in queries:
+        sql = str(query.compile(dialect=sqlite.dialect(), compile_kwargs={'literal_binds': True}))
+        for row in module.db.session.execute(text('EXPLAIN QUERY PLAN ' + sql)):
+            print('  ', row[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--orders', type=int, default=300000)
+    parser.add_argument('--products', type=int, default=70)
+    parser.add_argument('--lookups', type=int, default=2000)
+    args = parser.parse_args()
+
+    module = load_app(METRICS_ENABLED=0)
+    start = time.perf_counter()
+    seed_catalog(module, args.products)
+    seed_order_history(module, args.orders, args.products)
+    print(f'seeded {args.orders} orders in {time.perf_counter() - start:.1f} s')
+
+    rnd = random.Random(1)
+    customers = max(1, args.orders // 3)
+    with module.app.app_context():
+        print('query plans:')
+        query_plans(module)
+
+        samples, lines = [], 0
+        for _ in range(args.lookups):
+            email = f'Patient{rnd.randint(1, customers)}@Example.com'
+            start = time.perf_counter()
+            orders = module.order_history(email)
+            samples.append((time.perf_counter() - start) * 1000)
+            lines += sum(len(order['lines']) for order in orders)
+
+    samples.sort()
+    print(f'{args.lookups} lookups, {lines / args.lookups:.1f} lines each: '
+          f'p50 {statistics.median(samples):.2f} ms, p99 {samples[int(len(samples) * 0.99)]:.2f} ms')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,81 @@
+"""Compare the FTS5 product search with the old ilike name scan.
+
+Builds a throwaway SQLite database with a synthetic catalog and times both
+queries. Run from the project root:
+
+    python benchmarks/search_benchmark.py --products 100000
+"""
+import argparse
+import os
+import sqlite3
+import statistics
+import tempfile
+import time
+
+from common import synthetic_products
+from search_index import FTS_DDL, FTS_REBUILD, FTS_SEARCH, MARK_CLOSE, MARK_OPEN, build_match_query
+
+
+PRODUCT_DDL = """CREATE TABLE product (
+    product_id INTEGER NOT NULL,
+    name VARCHAR(100) NOT NULL,
+    price FLOAT NOT NULL,
+    description1 VARCHAR(1024),
+    description2 VARCHAR(1024),
+    PRIMARY KEY (product_id))"""
+
+# Same SQL SQLAlchemy emits for Product.name.ilike(...) on SQLite
+ILIKE_SEARCH = """
+    SELECT product_id, name, price, description1, description2
+    FROM product WHERE lower(name) LIKE lower(?)
+"""
+
+QUERIES = ['initial consultation', 'physio', 'knee rehab', 'vestibular', 'group class', 'hydro pool']
+
+
+def build_database(path, count):
+    conn = sqlite3.connect(path)
+    conn.execute(PRODUCT_DDL)
+    with conn:
+        conn.executemany('INSERT INTO product VALUES (?, ?, ?, ?, ?)', synthetic_products(count))
+    start = time.perf_counter()
+    with conn:
+        for statement in FTS_DDL:
+            conn.execute(statement)
+        conn.execute(FTS_REBUILD)
+    print(f'built FTS index over {count} products in {time.perf_counter() - start:.2f}s')
+    return conn
+
+
+def timed(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--products', type=int, default=100000)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--limit', type=int, default=50)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        conn = build_database(os.path.join(tmp, 'bench.db'), args.products)
+
+        print(f'{"query":<24}{"ilike ms":>10}{"hits":>8}{"fts5 ms":>10}{"hits":>8}')
+        for query in QUERIES:
+            ilike_ms, ilike_rows = timed(
+                lambda: conn.execute(ILIKE_SEARCH, (f'%{query}%',)).fetchall(), args.repeat)
+            params = {'query': build_match_query(query), 'limit': args.limit,
+                      'mark_open': MARK_OPEN, 'mark_close': MARK_CLOSE}
+            fts_ms, fts_rows = timed(lambda: conn.execute(FTS_SEARCH, params).fetchall(), args.repeat)
+            print(f'{query:<24}{ilike_ms:>10.2f}{len(ilike_rows):>8}{fts_ms:>10.2f}{len(fts_rows):>8}')
+        conn.close()
+
+
+if __name__ == '__main__':
+    main()
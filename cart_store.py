@@ -0,0 +1,174 @@
+import uuid
+from collections import namedtuple
+
+from flask import session
+from sqlalchemy import Integer, func, literal, select, union_all
+
+
+# One line of a cookie cart
+CartLine = namedtuple('CartLine', ['id', 'product_id', 'quantity'])
+
+# What the cart and checkout pages render: rows with id, product_id, name,
+# quantity, unit_price and line_total, plus the grand total of the cart
+CartView = namedtuple('CartView', ['lines', 'total'])
+
+# Keep the signed session cookie well below the 4 KB browser limit
+MAX_COOKIE_CART_LINES = 40
+
+
+def view_query(lines, product):
+    """Join cart lines (id, product_id, quantity) to the products in one query.
+
+    Line totals and the cart total (a window sum over the same rows) are
+    computed by the database, so rendering never touches a relationship.
+    """
+    line_total = product.price * lines.c.quantity
+    return (select(lines.c.id, lines.c.product_id, product.name, lines.c.quantity,
+                   product.price.label('unit_price'), line_total.label('line_total'),
+                   func.sum(line_total).over().label('cart_total'))
+            .join(product, product.product_id == lines.c.product_id)
+            .order_by(lines.c.id))
+
+
+def build_view(rows):
+    rows = rows.all()
+    return CartView(rows, rows[0].cart_total if rows else 0)
+
+
+class CookieCartStore:
+    """Cart kept in Flask's signed session cookie; nothing is written to the DB.
+
+    The cookie holds [line_id, product_id, quantity] triples only, product
+    names and prices are joined in by view().
+    """
+
+    def __init__(self, db, product_model):
+        self.db = db
+        self.product_model = product_model
+
+    def _lines(self):
+        return session.get('cart', [])
+
+    def items(self):
+        return [CartLine(*line) for line in self._lines()]
+
+    def view(self):
+        lines = self._lines()
+        if not lines:
+            return CartView([], 0)
+
+        # The cookie lines become an inline table: SELECT ? AS id, ... UNION ALL ...
+        cart_lines = union_all(*[
+            select(literal(line_id, Integer).label('id'),
+                   literal(product_id, Integer).label('product_id'),
+                   literal(quantity, Integer).label('quantity'))
+            for line_id, product_id, quantity in lines
+        ]).subquery('cart_lines')
+        return build_view(self.db.session.execute(view_query(cart_lines, self.product_model)))
+
+    # A line never drops to zero or below: remove() is how lines go away
+    def add(self, product_id, quantity):
+        lines = [list(line) for line in self._lines()]
+        for line in lines:
+            if line[1] == product_id:
+                if line[2] + quantity <= 0:
+                    return False
+                line[2] += quantity
+                break
+        else:
+            if quantity <= 0 or len(lines) >= MAX_COOKIE_CART_LINES:
+                return False
+            line_id = max((line[0] for line in lines), default=0) + 1
+            lines.append([line_id, product_id, quantity])
+        session['cart'] = lines
+        return True
+
+    def remove(self, line_id):
+        lines = self._lines()
+        kept = [line for line in lines if str(line[0]) != str(line_id)]
+        session['cart'] = kept
+        return len(kept) != len(lines)
+
+    def clear(self, commit=True):
+        session.pop('cart', None)
+
+
+class DatabaseCartStore:
+    """Cart rows in the cart_item table, scoped by a random per-session key.
+
+    Every statement filters on the indexed cart_key column, so visitors only
+    ever read, update or delete their own rows.
+    """
+
+    def __init__(self, db, model, product_model):
+        self.db = db
+        self.model = model
+        self.product_model = product_model
+
+    def cart_key(self, create=False):
+        key = session.get('cart_key')
+        if key is None and create:
+            key = session['cart_key'] = uuid.uuid4().hex
+        return key
+
+    def _query(self):
+        return self.model.query.filter_by(cart_key=self.cart_key())
+
+    def items(self):
+        if self.cart_key() is None:
+            return []
+        return self._query().order_by(self.model.id).all()
+
+    def view(self):
+        key = self.cart_key()
+        if key is None:
+            return CartView([], 0)
+
+        cart_lines = (select(self.model.id, self.model.product_id, self.model.quantity)
+                      .where(self.model.cart_key == key)
+                      .subquery('cart_lines'))
+        return build_view(self.db.session.execute(view_query(cart_lines, self.product_model)))
+
+    def add(self, product_id, quantity):
+        key = self.cart_key(create=True)
+        cart_item = self.model.query.filter_by(cart_key=key, product_id=product_id).first()
+        if cart_item:
+            if cart_item.quantity + quantity <= 0:
+                return False
+            cart_item.quantity += quantity
+        elif quantity <= 0:
+            return False
+        else:
+            self.db.session.add(self.model(cart_key=key, product_id=product_id, quantity=quantity))
+        self.db.session.commit()
+        return True
+
+    def remove(self, line_id):
+        if self.cart_key() is None:
+            return False
+        deleted = self._query().filter_by(id=line_id).delete()
+        self.db.session.commit()
+        return deleted > 0
+
+    def clear(self, commit=True):
+        if self.cart_key() is None:
+            return
+        self._query().delete()
+        if commit:
+            self.db.session.commit()
+
+
+def init_cart_store(app, db, model, product_model):
+    """Pick the cart backend from CART_BACKEND ('cookie' or 'db').
+
+    The store is also kept in app.extensions['cart_store'] for the views.
+    """
+    backend = app.config.setdefault('CART_BACKEND', 'cookie')
+    if backend == 'cookie':
+        store = CookieCartStore(db, product_model)
+    elif backend == 'db':
+        store = DatabaseCartStore(db, model, product_model)
+    else:
+        raise ValueError(f'Unknown CART_BACKEND: {backend!r}')
+    app.extensions['cart_store'] = store
+    return store
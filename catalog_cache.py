@@ -0,0 +1,136 @@
+import bisect
+import threading
+import time
+import weakref
+from collections import namedtuple
+
+from flask import current_app
+from sqlalchemy import event, select
+from sqlalchemy.orm import Session, object_session
+
+
+# Read-only copy of the listing columns of a product, safe to share between
+# requests and threads. The multi-KB descriptions are not cached.
+CachedProduct = namedtuple('CachedProduct', ['product_id', 'name', 'price', 'duration_minutes', 'practitioner_role'])
+
+# One loaded version of the catalog (swapped as a whole, never mutated)
+_Snapshot = namedtuple('_Snapshot', ['version', 'loaded_at', 'products', 'ids', 'by_id'])
+
+
+class _CatalogState:
+    """The cached catalog of one application, kept in app.extensions."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.snapshot = None
+        self.version = 0
+
+
+class CatalogCache:
+    """In-process copy of the product catalog, loaded once per worker.
+
+    Writes to Product through the ORM bump the cache version so the next read
+    reloads; CATALOG_CACHE_TTL bounds how long other workers keep a stale copy.
+    Each application gets its own copy in app.extensions['catalog_cache'].
+    """
+
+    def __init__(self, app=None, db=None, model=None):
+        self._states = weakref.WeakSet()
+        if app is not None:
+            self.init_app(app, db, model)
+
+    def init_app(self, app, db, model):
+        self.db = db
+        self.model = model
+        app.config.setdefault('CATALOG_CACHE_TTL', 60)
+        state = app.extensions['catalog_cache'] = _CatalogState()
+        self._states.add(state)
+
+        if not event.contains(model, 'after_insert', self._on_product_change):
+            for name in ('after_insert', 'after_update', 'after_delete'):
+                event.listen(model, name, self._on_product_change)
+            event.listen(Session, 'after_commit', self._on_commit)
+            event.listen(Session, 'after_rollback', self._on_rollback)
+
+    # Invalidation hooks
+    def _on_product_change(self, mapper, connection, target):
+        self.invalidate()
+        session = object_session(target)
+        if session is not None:
+            # Reload again once the change is visible to other connections
+            session.info['catalog_dirty'] = True
+
+    def _on_commit(self, session):
+        if session.info.pop('catalog_dirty', False):
+            self.invalidate()
+
+    def _on_rollback(self, session):
+        if session.info.pop('catalog_dirty', False):
+            self.invalidate()
+
+    def invalidate(self):
+        # ORM events do not say which application wrote, so every copy reloads
+        for state in list(self._states):
+            with state.lock:
+                state.version += 1
+
+    # Loading
+    def _load(self):
+        model = self.model
+        stmt = (select(model.product_id, model.name, model.price, model.duration_minutes, model.practitioner_role)
+                .order_by(model.product_id))
+
+        # Use a separate connection so uncommitted rows of the current
+        # request's session never end up in the shared cache
+        with self.db.engine.connect() as conn:
+            return [CachedProduct(*row) for row in conn.execute(stmt)]
+
+    def _get_snapshot(self):
+        state = current_app.extensions['catalog_cache']
+        ttl = current_app.config['CATALOG_CACHE_TTL']
+        snapshot = state.snapshot
+        if (snapshot is not None and snapshot.version == state.version
+                and time.monotonic() - snapshot.loaded_at < ttl):
+            return snapshot
+
+        with state.lock:
+            snapshot = state.snapshot
+            now = time.monotonic()
+            if (snapshot is not None and snapshot.version == state.version
+                    and now - snapshot.loaded_at < ttl):
+                return snapshot
+
+            products = tuple(self._load())
+            snapshot = _Snapshot(state.version, now, products,
+                                 [product.product_id for product in products],
+                                 {product.product_id: product for product in products})
+            state.snapshot = snapshot
+            return snapshot
+
+    # Read API
+    def all(self):
+        return self._get_snapshot().products
+
+    def get(self, product_id):
+        try:
+            product_id = int(product_id)
+        except (TypeError, ValueError):
+            return None
+        return self._get_snapshot().by_id.get(product_id)
+
+    def page(self, after=0, limit=20):
+        """Keyset page: up to `limit` products with product_id > `after`.
+
+        Returns (products, next_after); next_after is None on the last page.
+        """
+        snapshot = self._get_snapshot()
+        start = bisect.bisect_right(snapshot.ids, after)
+        products = snapshot.products[start:start + limit]
+        more = start + limit < len(snapshot.products)
+        return products, (products[-1].product_id if more else None)
+
+    def search(self, query):
+        # Case-insensitive substring match on the name, same as the ilike query
+        needle = (query or '').casefold()
+        return [product for product in self._get_snapshot().products
+                if needle in product.name.casefold()]
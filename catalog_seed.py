@@ -0,0 +1,84 @@
+import json
+
+from sqlalchemy import delete, insert, select, update
+
+
+# Columns read from the data file; product_id decides insert or update
+PRODUCT_FIELDS = ('product_id', 'name', 'price', 'duration_minutes', 'practitioner_role',
+                  'description1', 'description2')
+PRACTITIONER_FIELDS = ('id', 'name', 'role')
+
+
+def load_products(path):
+    """Read the treatments from a JSON file: a list of objects with PRODUCT_FIELDS."""
+    with open(path, encoding='utf-8') as f:
+        rows = json.load(f)
+
+    products = []
+    for n, row in enumerate(rows, 1):
+        missing = {'product_id', 'name', 'price'} - set(row)
+        if missing:
+            raise ValueError(f'{path}: product #{n} has no {", ".join(sorted(missing))}')
+        products.append({field: row.get(field) for field in PRODUCT_FIELDS})
+    return products
+
+
+def minute_of_day(value):
+    hours, minutes = value.split(':')
+    return int(hours) * 60 + int(minutes)
+
+
+def load_practitioners(path):
+    """Read practitioners and their weekly hours from a JSON file.
+
+    Each object has PRACTITIONER_FIELDS and "hours": [[weekday, "HH:MM",
+    "HH:MM"], ...] with 0 for Monday. Returns (practitioners, hours) rows.
+    """
+    with open(path, encoding='utf-8') as f:
+        rows = json.load(f)
+
+    practitioners, hours = [], []
+    for n, row in enumerate(rows, 1):
+        missing = set(PRACTITIONER_FIELDS) - set(row)
+        if missing:
+            raise ValueError(f'{path}: practitioner #{n} has no {", ".join(sorted(missing))}')
+        practitioners.append({field: row[field] for field in PRACTITIONER_FIELDS})
+        for weekday, start, end in row.get('hours', []):
+            hours.append({'practitioner_id': row['id'], 'weekday': weekday,
+                          'start_minute': minute_of_day(start), 'end_minute': minute_of_day(end)})
+    return practitioners, hours
+
+
+def upsert(session, model, fields, rows):
+    """Insert new rows and update changed ones in the session's transaction.
+
+    The first of `fields` is the primary key. One SELECT plus at most one
+    executemany INSERT and one UPDATE, however many rows; running it again
+    with the same data writes nothing. Returns (inserted, updated).
+    """
+    columns = [getattr(model, field) for field in fields]
+    existing = {row[0]: tuple(row) for row in session.execute(select(*columns))}
+
+    key = fields[0]
+    new = [row for row in rows if row[key] not in existing]
+    changed = [row for row in rows if row[key] in existing
+               and existing[row[key]] != tuple(row[field] for field in fields)]
+    if new:
+        session.execute(insert(model), new)
+    if changed:
+        session.execute(update(model), changed)
+    return len(new), len(changed)
+
+
+def upsert_products(session, model, products):
+    return upsert(session, model, PRODUCT_FIELDS, products)
+
+
+def upsert_practitioners(session, model, hours_model, practitioners, hours):
+    """Upsert the practitioners and replace their weekly hours."""
+    counts = upsert(session, model, PRACTITIONER_FIELDS, practitioners)
+    ids = [row['id'] for row in practitioners]
+    session.execute(delete(hours_model).where(hours_model.practitioner_id.in_(ids)))
+    if hours:
+        session.execute(insert(hours_model), hours)
+    return counts
@@ -0,0 +1,37 @@
+from sqlalchemy import insert, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+
+
+# Dialects with INSERT ... ON CONFLICT DO UPDATE (SQLite 3.24+, PostgreSQL 9.5+)
+UPSERT_INSERTS = {'sqlite': sqlite.insert, 'postgresql': postgresql.insert}
+
+
+def normalize_email(email):
+    """Customers are matched on the trimmed, lower-cased address."""
+    return (email or '').strip().lower()
+
+
+def upsert_customer(session, model, email, **details):
+    """Id of the customer with `email`, created or updated with `details`.
+
+    One INSERT ... ON CONFLICT (email) DO UPDATE on SQLite and PostgreSQL,
+    so returning patients keep a single row even when two checkouts for the
+    same address run at once. Relies on the unique index on customer.email.
+    RETURNING is not used: it needs SQLite 3.35, newer than some distributions
+    ship (Ubuntu 20.04 has 3.31).
+    """
+    email = normalize_email(email)
+    dialect = session.get_bind().dialect.name
+
+    if dialect in UPSERT_INSERTS:
+        stmt = UPSERT_INSERTS[dialect](model).values(email=email, **details)
+        stmt = stmt.on_conflict_do_update(index_elements=[model.email], set_=details)
+        session.execute(stmt)
+        # The upsert locked the row for this transaction, so it is still there
+        return session.execute(select(model.id).where(model.email == email)).scalar_one()
+
+    customer_id = session.execute(select(model.id).where(model.email == email)).scalar()
+    if customer_id is None:
+        return session.execute(insert(model).values(email=email, **details)).inserted_primary_key[0]
+    session.execute(update(model).where(model.id == customer_id).values(**details))
+    return customer_id
@@ -0,0 +1,80 @@
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+from sqlalchemy.pool import StaticPool
+
+
+# Pool options only make sense for a QueuePool over a database file
+POOL_OPTIONS = ('pool_size', 'max_overflow', 'pool_timeout')
+
+# Engine profiles for SQLite, picked with DB_PROFILE.
+#   'default'    SQLAlchemy defaults: rollback journal, readers wait on writers
+#   'production' WAL journal so reads run alongside the single writer, a busy
+#                timeout instead of immediate "database is locked", bigger
+#                page cache and memory-mapped reads, and a pool sized for
+#                threaded workers
+# journal_mode=WAL is stored in the database file, so it stays on even if the
+# profile is switched back to 'default'.
+PROFILES = {
+    'default': {
+        'engine_options': {},
+        'pragmas': {},
+    },
+    'production': {
+        'engine_options': {
+            'pool_size': 10,
+            'max_overflow': 20,
+            'pool_timeout': 10,
+            'connect_args': {'timeout': 5, 'check_same_thread': False},
+        },
+        'pragmas': {
+            'journal_mode': 'WAL',
+            'synchronous': 'NORMAL',
+            'busy_timeout': 5000,
+            'cache_size': -64000,     # KiB, i.e. 64 MB per connection
+            'mmap_size': 268435456,   # 256 MB
+            'temp_store': 'MEMORY',
+        },
+    },
+}
+
+
+def in_memory(uri):
+    """True for SQLite URIs without a database file (served by a StaticPool)."""
+    url = make_url(uri)
+    return url.database in (None, '', ':memory:') or url.query.get('mode') == 'memory'
+
+
+def configure_engine(app, profile=None):
+    """Put the profile's pool settings into SQLALCHEMY_ENGINE_OPTIONS.
+
+    Call before SQLAlchemy(app) creates the engine; then call
+    apply_pragmas(db.engine, ...) with the returned pragmas.
+    """
+    profile = profile or app.config.setdefault('DB_PROFILE', 'production')
+    if profile not in PROFILES:
+        raise ValueError(f'Unknown DB_PROFILE: {profile!r}')
+    app.config['DB_PROFILE'] = profile
+
+    if not app.config['SQLALCHEMY_DATABASE_URI'].startswith('sqlite'):
+        return {}
+
+    options = app.config.setdefault('SQLALCHEMY_ENGINE_OPTIONS', {})
+    single_connection = in_memory(app.config['SQLALCHEMY_DATABASE_URI']) or options.get('poolclass') is StaticPool
+    for key, value in PROFILES[profile]['engine_options'].items():
+        if single_connection and key in POOL_OPTIONS:
+            continue
+        options.setdefault(key, value)
+    return PROFILES[profile]['pragmas']
+
+
+def apply_pragmas(engine, pragmas):
+    """Run the PRAGMAs on every new DBAPI connection in the pool."""
+    if not pragmas:
+        return
+
+    @event.listens_for(engine, 'connect')
+    def set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas.items():
+            cursor.execute(f'PRAGMA {name}={value}')
+        cursor.close()
@@ -0,0 +1,141 @@
+import threading
+import time
+
+from flask import Response, current_app, g, has_request_context, request
+from sqlalchemy import event
+
+
+# Upper bounds (seconds) of the request latency histogram buckets
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+# Statements kept per request for the slow-request log
+MAX_LOGGED_QUERIES = 50
+
+
+class EndpointStats:
+    def __init__(self):
+        self.buckets = [0] * len(LATENCY_BUCKETS)
+        self.count = 0
+        self.seconds = 0.0
+        self.queries = 0
+        self.sql_seconds = 0.0
+
+    def observe(self, seconds, queries, sql_seconds):
+        for i, bound in enumerate(LATENCY_BUCKETS):
+            if seconds <= bound:
+                self.buckets[i] += 1
+                break
+        self.count += 1
+        self.seconds += seconds
+        self.queries += queries
+        self.sql_seconds += sql_seconds
+
+
+class _Metrics:
+    """EndpointStats of one application, by endpoint name."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.stats = {}
+
+
+class Instrumentation:
+    """Per-request timing and SQL counting, exposed as Server-Timing and /metrics.
+
+    Each request costs two perf_counter() calls plus two per SQL statement.
+    Set METRICS_ENABLED to False to register nothing at all. Figures are per
+    worker process and application (app.extensions['instrumentation']).
+    """
+
+    def __init__(self, app=None, db=None):
+        if app is not None:
+            self.init_app(app, db)
+
+    def init_app(self, app, db):
+        app.config.setdefault('SLOW_REQUEST_MS', 500)
+        if not app.config.setdefault('METRICS_ENABLED', True):
+            return
+        app.extensions['instrumentation'] = _Metrics()
+
+        app.before_request(self._start_request)
+        app.after_request(self._finish_request)
+        app.add_url_rule('/metrics', 'metrics', self.metrics_view)
+
+        with app.app_context():
+            engine = db.engine
+        event.listen(engine, 'before_cursor_execute', self._before_cursor_execute)
+        event.listen(engine, 'after_cursor_execute', self._after_cursor_execute)
+
+    # SQLAlchemy hooks
+    def _before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        conn.info['query_start'] = time.perf_counter()
+
+    def _after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info.pop('query_start', time.perf_counter())
+        if has_request_context() and 'sql_queries' in g:
+            g.sql_seconds += elapsed
+            g.sql_count += 1
+            if len(g.sql_queries) < MAX_LOGGED_QUERIES:
+                g.sql_queries.append((statement, elapsed))
+
+    # Flask hooks
+    def _start_request(self):
+        g.request_start = time.perf_counter()
+        g.sql_count = 0
+        g.sql_seconds = 0.0
+        g.sql_queries = []
+
+    def _finish_request(self, response):
+        if 'request_start' not in g:
+            return response
+        seconds = time.perf_counter() - g.request_start
+        endpoint = request.endpoint or 'unmatched'
+
+        response.headers.add('Server-Timing', f'app;dur={seconds * 1000:.1f}')
+        response.headers.add('Server-Timing',
+                             f'db;dur={g.sql_seconds * 1000:.1f};desc="{g.sql_count} queries"')
+
+        metrics = current_app.extensions['instrumentation']
+        with metrics.lock:
+            stats = metrics.stats.get(endpoint)
+            if stats is None:
+                stats = metrics.stats[endpoint] = EndpointStats()
+            stats.observe(seconds, g.sql_count, g.sql_seconds)
+
+        if seconds * 1000 >= current_app.config['SLOW_REQUEST_MS']:
+            queries = '\n'.join(f'  {elapsed * 1000:7.1f} ms  {statement}' for statement, elapsed in g.sql_queries)
+            current_app.logger.warning('Slow request %s %s: %.0f ms, %d queries (%.0f ms SQL)\n%s',
+                                    request.method, request.path, seconds * 1000,
+                                    g.sql_count, g.sql_seconds * 1000, queries)
+        return response
+
+    # Prometheus text exposition
+    def render(self):
+        metrics = current_app.extensions['instrumentation']
+        with metrics.lock:
+            snapshot = {endpoint: (list(stats.buckets), stats.count, stats.seconds,
+                                   stats.queries, stats.sql_seconds)
+                        for endpoint, stats in sorted(metrics.stats.items())}
+
+        lines = ['# HELP haven_request_duration_seconds Request latency by endpoint.',
+                 '# TYPE haven_request_duration_seconds histogram']
+        for endpoint, (buckets, count, seconds, _, _) in snapshot.items():
+            cumulative = 0
+            for bound, n in zip(LATENCY_BUCKETS, buckets):
+                cumulative += n
+                lines.append(f'haven_request_duration_seconds_bucket{{endpoint="{endpoint}",le="{bound}"}} {cumulative}')
+            lines.append(f'haven_request_duration_seconds_bucket{{endpoint="{endpoint}",le="+Inf"}} {count}')
+            lines.append(f'haven_request_duration_seconds_sum{{endpoint="{endpoint}"}} {seconds:.6f}')
+            lines.append(f'haven_request_duration_seconds_count{{endpoint="{endpoint}"}} {count}')
+
+        lines += ['# HELP haven_sql_queries_total SQL statements executed, by endpoint.',
+                  '# TYPE haven_sql_queries_total counter']
+        lines += [f'haven_sql_queries_total{{endpoint="{endpoint}"}} {values[3]}'
+                  for endpoint, values in snapshot.items()]
+        lines += ['# HELP haven_sql_duration_seconds_total Time spent in SQL, by endpoint.',
+                  '# TYPE haven_sql_duration_seconds_total counter']
+        lines += [f'haven_sql_duration_seconds_total{{endpoint="{endpoint}"}} {values[4]:.6f}'
+                  for endpoint, values in snapshot.items()]
+        return '\n'.join(lines) + '\n'
+
+    def metrics_view(self):
+        return Response(self.render(), mimetype='text/plain; version=0.0.4')
@@ -0,0 +1,137 @@
+import functools
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+
+from flask import Response, current_app, request, session
+
+
+class _Pages:
+    """The rendered pages of one application, least recently used first."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()
+
+
+class PageCache:
+    """Rendered-HTML cache for pages that look the same for every visitor.
+
+    Pages are keyed by endpoint, the newest template mtime and the digest of
+    the asset manifest, kept in an in-memory LRU and optionally in
+    PAGE_CACHE_DIR, and served with a strong ETag so browsers and proxies
+    can revalidate with 304s.
+
+    Cached pages must not contain per-visitor data: their forms are rendered
+    without a CSRF token (base.html fetches one from /csrf_token), and a
+    request with pending flash messages is rendered fresh and not stored.
+    Cached responses never carry Vary: Cookie. Each application keeps its
+    own pages in app.extensions['page_cache'].
+    """
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('PAGE_CACHE_ENABLED', True)
+        app.config.setdefault('PAGE_CACHE_SIZE', 64)
+        app.config.setdefault('PAGE_CACHE_MAX_AGE', 0)
+        directory = app.config.setdefault('PAGE_CACHE_DIR', None)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        app.extensions['page_cache'] = _Pages()
+
+    def templates_mtime(self):
+        folder = os.path.join(current_app.root_path, current_app.template_folder)
+        return max(entry.stat().st_mtime_ns for entry in os.scandir(folder) if entry.is_file())
+
+    def assets_digest(self):
+        # Pages link the hashed files of the current asset build (assets.py)
+        manifest = current_app.extensions.get('assets')
+        return getattr(manifest, 'digest', None)
+
+    # In-memory LRU
+    def _get(self, key):
+        pages = current_app.extensions['page_cache']
+        with pages.lock:
+            page = pages.entries.get(key)
+            if page is not None:
+                pages.entries.move_to_end(key)
+            return page
+
+    def _put(self, key, page):
+        pages = current_app.extensions['page_cache']
+        with pages.lock:
+            pages.entries[key] = page
+            pages.entries.move_to_end(key)
+            while len(pages.entries) > current_app.config['PAGE_CACHE_SIZE']:
+                pages.entries.popitem(last=False)
+
+    # Optional on-disk store, shared by all workers on the host
+    def _disk_path(self, key):
+        name = hashlib.sha1(repr(key).encode()).hexdigest()
+        return os.path.join(current_app.config['PAGE_CACHE_DIR'], name + '.html')
+
+    def _load(self, key):
+        try:
+            with open(self._disk_path(key), 'rb') as f:
+                return f.read()
+        except OSError:
+            return None
+
+    def _store(self, key, body):
+        path = self._disk_path(key)
+        tmp = f'{path}.{os.getpid()}.tmp'
+        with open(tmp, 'wb') as f:
+            f.write(body)
+        os.replace(tmp, path)
+
+    def _page(self, key, view, args, kwargs):
+        page = self._get(key)
+        if page is not None:
+            return page
+
+        directory = current_app.config['PAGE_CACHE_DIR']
+        body = self._load(key) if directory else None
+        if body is None:
+            body = view(*args, **kwargs)
+            if isinstance(body, str):
+                body = body.encode('utf-8')
+            if directory:
+                self._store(key, body)
+
+        page = (body, hashlib.sha256(body).hexdigest()[:32])
+        self._put(key, page)
+        return page
+
+    def cached(self, view):
+        """Decorator for views that return a template rendered without per-visitor data."""
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            if not current_app.config['PAGE_CACHE_ENABLED'] or request.method != 'GET':
+                return view(*args, **kwargs)
+            if '_flashes' in session:
+                # This response carries the visitor's messages; keep it out of every cache
+                response = current_app.make_response(view(*args, **kwargs))
+                response.cache_control.no_store = True
+                return response
+
+            key = (request.endpoint, tuple(sorted(kwargs.items())), self.templates_mtime(), self.assets_digest())
+            body, etag = self._page(key, view, args, kwargs)
+
+            response = Response(body, mimetype='text/html')
+            response.set_etag(etag)
+            response.cache_control.public = True
+            response.cache_control.max_age = current_app.config['PAGE_CACHE_MAX_AGE']
+            # The flash lookups above touched the session, and Flask would answer
+            # that with Vary: Cookie; the page is the same whatever the cookie says
+            session.accessed = False
+            return response.make_conditional(request)
+        return wrapper
+
+    def clear(self):
+        pages = current_app.extensions['page_cache']
+        with pages.lock:
+            pages.entries.clear()
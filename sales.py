@@ -0,0 +1,81 @@
+import csv
+import io
+import json
+
+from sqlalchemy import and_, insert, update
+
+from customers import UPSERT_INSERTS
+
+
+# Counters of the summary tables; the other columns of a row are its key
+TOTAL_COLUMNS = ('orders', 'quantity', 'revenue')
+
+
+def sales_by_product(lines):
+    """Summary rows for one order: counters per product_id."""
+    totals = {}
+    for line in lines:
+        row = totals.setdefault(line.product_id, {'product_id': line.product_id,
+                                                  'orders': 1, 'quantity': 0, 'revenue': 0.0})
+        row['quantity'] += line.quantity
+        row['revenue'] += line.quantity * (line.unit_price or 0)
+    return list(totals.values())
+
+
+def add_totals(session, table, rows):
+    """Add the counters in `rows` to `table`, creating rows that are missing.
+
+    One executemany INSERT ... ON CONFLICT DO UPDATE SET n = n + excluded.n,
+    run in the caller's transaction, so concurrent checkouts never lose an
+    increment.
+    """
+    if not rows:
+        return
+    dialect = session.get_bind().dialect.name
+    keys = list(table.primary_key.columns)
+
+    if dialect in UPSERT_INSERTS:
+        stmt = UPSERT_INSERTS[dialect](table)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=keys,
+            set_={name: table.c[name] + stmt.excluded[name] for name in TOTAL_COLUMNS})
+        session.execute(stmt, rows)
+        return
+
+    for row in rows:
+        result = session.execute(
+            update(table).where(and_(*(key == row[key.name] for key in keys)))
+            .values({name: table.c[name] + row[name] for name in TOTAL_COLUMNS}))
+        if result.rowcount == 0:
+            session.execute(insert(table).values(row))
+
+
+# Streaming exports: each chunk holds `batch_size` rows, so memory use does
+# not depend on how many rows the query returns
+def csv_chunks(columns, rows, batch_size):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    for n, row in enumerate(rows, 1):
+        writer.writerow(row)
+        if n % batch_size == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+def ndjson_chunks(columns, rows, batch_size):
+    chunk = []
+    for row in rows:
+        chunk.append(json.dumps(dict(zip(columns, row)), default=str) + '\n')
+        if len(chunk) == batch_size:
+            yield ''.join(chunk)
+            chunk = []
+    yield ''.join(chunk)
+
+
+EXPORT_FORMATS = {
+    'csv': ('text/csv', csv_chunks),
+    'ndjson': ('application/x-ndjson', ndjson_chunks),
+}
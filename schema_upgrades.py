@@ -0,0 +1,67 @@
+from sqlalchemy import inspect, text
+
+
+# db.create_all() only creates missing tables. These steps bring an existing
+# ecommerce.db up to date with the models; each one is safe to run again.
+
+def ensure_column(conn, table, column, ddl):
+    columns = {col['name'] for col in inspect(conn).get_columns(table)}
+    if column not in columns:
+        conn.execute(text(f'ALTER TABLE "{table}" ADD COLUMN {ddl}'))
+
+
+def ensure_index(conn, name, table, columns):
+    conn.execute(text(f'CREATE INDEX IF NOT EXISTS {name} ON "{table}" ({columns})'))
+
+
+def merge_duplicate_customers(conn):
+    """Fold customers sharing an email (ignoring case and spaces) into one row.
+
+    The newest row has the latest name and phone and is kept; the orders of
+    the others move to it. Emails are then stored normalized so the unique
+    index can be built.
+    """
+    conn.execute(text('''
+        CREATE TEMP TABLE customer_merge AS
+        SELECT c.id AS old_id, keep.id AS new_id
+        FROM customer AS c
+        JOIN (SELECT lower(trim(email)) AS email, max(id) AS id FROM customer
+              GROUP BY lower(trim(email)) HAVING count(*) > 1) AS keep
+          ON lower(trim(c.email)) = keep.email AND c.id != keep.id'''))
+    conn.execute(text('''
+        UPDATE "order" SET customer_id = (
+            SELECT new_id FROM customer_merge WHERE old_id = "order".customer_id)
+        WHERE customer_id IN (SELECT old_id FROM customer_merge)'''))
+    conn.execute(text('DELETE FROM customer WHERE id IN (SELECT old_id FROM customer_merge)'))
+    conn.execute(text('DROP TABLE customer_merge'))
+    conn.execute(text('UPDATE customer SET email = lower(trim(email)) WHERE email != lower(trim(email))'))
+
+
+def upgrade_schema(engine):
+    with engine.begin() as conn:
+        # Carts are scoped per session (cart_store.DatabaseCartStore)
+        ensure_column(conn, 'cart_item', 'cart_key', "cart_key VARCHAR(32) NOT NULL DEFAULT ''")
+        ensure_index(conn, 'ix_cart_item_cart_key', 'cart_item', 'cart_key')
+
+        # Idempotent checkout and price snapshots (app.place_order)
+        ensure_column(conn, 'order', 'idempotency_key', 'idempotency_key VARCHAR(64)')
+        conn.execute(text('CREATE UNIQUE INDEX IF NOT EXISTS ix_order_idempotency_key '
+                          'ON "order" (idempotency_key)'))
+        ensure_column(conn, 'order_item', 'unit_price', 'unit_price FLOAT')
+
+        # Appointment length and practitioner role of the bookable treatments
+        ensure_column(conn, 'product', 'duration_minutes', 'duration_minutes INTEGER')
+        ensure_column(conn, 'product', 'practitioner_role', 'practitioner_role VARCHAR(100)')
+
+        # Order dates for the daily sales summary and the export (app.record_sales)
+        ensure_column(conn, 'order', 'created_at', 'created_at DATETIME')
+        ensure_index(conn, 'ix_order_created_at', 'order', 'created_at')
+
+        # One customer per email (customers.upsert_customer) and the indexes
+        # behind app.order_history
+        if 'ix_customer_email' not in {index['name'] for index in inspect(conn).get_indexes('customer')}:
+            merge_duplicate_customers(conn)
+            conn.execute(text('CREATE UNIQUE INDEX ix_customer_email ON customer (email)'))
+        ensure_index(conn, 'ix_order_customer_id', 'order', 'customer_id')
+        ensure_index(conn, 'ix_order_item_order_lines', 'order_item', 'order_id, product_id, quantity, unit_price')
+        ensure_index(conn, 'ix_order_item_product_id', 'order_item', 'product_id')
@@ -0,0 +1,157 @@
+import re
+import threading
+
+from flask import current_app
+from markupsafe import Markup, escape
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+
+
+# FTS5 index over the product table. It is an external-content table, so the
+# text lives only in `product`; the triggers keep the index in step with any
+# write, whether it comes from the ORM or from plain SQL.
+FTS_DDL = [
+    """CREATE VIRTUAL TABLE IF NOT EXISTS product_fts USING fts5(
+        name, description1, description2,
+        content='product', content_rowid='product_id',
+        tokenize='unicode61 remove_diacritics 2', prefix='2 3')""",
+    """CREATE TRIGGER IF NOT EXISTS product_fts_ai AFTER INSERT ON product BEGIN
+        INSERT INTO product_fts(rowid, name, description1, description2)
+        VALUES (new.product_id, new.name, new.description1, new.description2);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS product_fts_ad AFTER DELETE ON product BEGIN
+        INSERT INTO product_fts(product_fts, rowid, name, description1, description2)
+        VALUES ('delete', old.product_id, old.name, old.description1, old.description2);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS product_fts_au AFTER UPDATE ON product BEGIN
+        INSERT INTO product_fts(product_fts, rowid, name, description1, description2)
+        VALUES ('delete', old.product_id, old.name, old.description1, old.description2);
+        INSERT INTO product_fts(rowid, name, description1, description2)
+        VALUES (new.product_id, new.name, new.description1, new.description2);
+    END""",
+]
+
+FTS_REBUILD = "INSERT INTO product_fts(product_fts) VALUES ('rebuild')"
+
+# Matches in the name weigh more than matches in the descriptions
+FTS_SEARCH = """
+    SELECT p.product_id, p.name, p.price,
+           snippet(product_fts, 1, :mark_open, :mark_close, '...', 32) AS desc1
+    FROM product_fts
+    JOIN product AS p ON p.product_id = product_fts.rowid
+    WHERE product_fts MATCH :query
+    ORDER BY bm25(product_fts, 10.0, 2.0, 1.0)
+    LIMIT :limit
+"""
+
+# Placeholders for the highlight tags, swapped for <mark> after escaping
+MARK_OPEN = '\x02'
+MARK_CLOSE = '\x03'
+
+MAX_QUERY_TERMS = 8
+
+
+def build_match_query(search_query):
+    """Turn free text into an FTS5 query: every word is a quoted prefix term.
+
+    "physio initial" becomes '"physio"* "initial"*', so all words must match
+    and partial words still find the treatment. Returns '' when nothing is left.
+    """
+    terms = re.findall(r'\w+', search_query or '')[:MAX_QUERY_TERMS]
+    return ' '.join(f'"{term}"*' for term in terms)
+
+
+def highlight(snippet):
+    if snippet is None:
+        return ''
+    html = str(escape(snippet))
+    return Markup(html.replace(MARK_OPEN, '<mark>').replace(MARK_CLOSE, '</mark>'))
+
+
+class _IndexState:
+    """FTS5 status of one application: None until set up, then True or False."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.ready = None
+
+
+class SearchIndex:
+    """Ranked product search on SQLite FTS5.
+
+    `available` is False when the database is not SQLite or SQLite was built
+    without FTS5; callers then use the plain name match instead. init_db()
+    creates the index; until it succeeds each search tries again. The result
+    is kept per application (app.extensions['search_index']).
+    """
+
+    def __init__(self, app=None, db=None):
+        if app is not None:
+            self.init_app(app, db)
+
+    def init_app(self, app, db):
+        self.db = db
+        app.config.setdefault('SEARCH_RESULT_LIMIT', 50)
+        app.extensions['search_index'] = _IndexState()
+
+    @property
+    def limit(self):
+        return current_app.config['SEARCH_RESULT_LIMIT']
+
+    def create(self, rebuild=False):
+        """Create the index and its triggers, filling it from `product` if new."""
+        with self.db.engine.begin() as conn:
+            exists = conn.execute(text(
+                "SELECT 1 FROM sqlite_master WHERE name = 'product_fts'")).first()
+            for statement in FTS_DDL:
+                conn.execute(text(statement))
+            if rebuild or not exists:
+                conn.execute(text(FTS_REBUILD))
+
+    @property
+    def available(self):
+        state = current_app.extensions['search_index']
+        if state.ready is None:
+            with state.lock:
+                if state.ready is None:
+                    state.ready = self._setup()
+        return bool(state.ready)
+
+    def install(self):
+        """Create the index now (init_db does) and return whether it is available."""
+        state = current_app.extensions['search_index']
+        with state.lock:
+            state.ready = self._setup()
+        return bool(state.ready)
+
+    def _setup(self):
+        if self.db.engine.dialect.name != 'sqlite':
+            return False
+        try:
+            self.create()
+        except OperationalError as e:
+            if 'no such module' in str(e.orig):
+                # SQLite built without FTS5: that will not change in this process
+                return False
+            # E.g. no product table before init_db, or "database is locked":
+            # use the plain match for now and try again on the next search
+            current_app.logger.warning('Search index not ready, retrying later: %s', e.orig)
+            return None
+        return True
+
+    def search(self, search_query, limit=None):
+        match = build_match_query(search_query)
+        if not match:
+            return []
+
+        rows = self.db.session.execute(text(FTS_SEARCH), {
+            'query': match,
+            'limit': limit or self.limit,
+            'mark_open': MARK_OPEN,
+            'mark_close': MARK_CLOSE,
+        })
+        return [
+            {'product_id': row.product_id, 'name': row.name, 'price': row.price,
+             'desc1': highlight(row.desc1)}
+            for row in rows
+        ]
@@ -0,0 +1,41 @@
+"""WSGI entry point for multi-process servers.
+
+    flask --app app seed                          # once per deploy
+    export SECRET_KEY=...                         # required, same for every worker
+    gunicorn --preload --workers 4 --threads 4 wsgi:app
+    waitress-serve --threads 8 wsgi:app
+
+Importing this module builds the app and warms it up (catalog, search index,
+compiled templates), so with --preload the work is done once in the master
+and shared copy-on-write by the workers. Without --preload each worker warms
+itself before it accepts requests.
+"""
+import os
+
+from app import catalog, create_app, db, search_index
+
+
+def warm_up(app):
+    with app.app_context():
+        catalog.all()
+        search_index.available
+        for name in app.jinja_loader.list_templates():
+            app.jinja_env.get_template(name)
+
+        # Close the connections opened above; a forked worker must not reuse
+        # the parent's SQLite handles
+        engine = db.engine
+        engine.dispose()
+
+    # Also covers servers that fork after the first request. close=False drops
+    # the inherited pool without closing the parent's connections.
+    os.register_at_fork(after_in_child=lambda: engine.dispose(close=False))
+
+
+# Every worker must sign session cookies with the same, secret key
+if not os.environ.get('SECRET_KEY'):
+    raise RuntimeError('SECRET_KEY is not set; export a long random value, e.g. from '
+                       '`python -c "import secrets; print(secrets.token_hex(32))"`')
+
+app = create_app()
+warm_up(app)